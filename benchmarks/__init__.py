@@ -0,0 +1,2 @@
+# Benchmarks, run from the repository root, e.g. python -m benchmarks.fraction_bench
+# python -m benchmarks runs the full suite
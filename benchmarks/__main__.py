@@ -0,0 +1,196 @@
+# Benchmark suite for the whole package, for catching performance regressions
+# Every workload is run over a sweep of sizes, recording the best wall time over a few repeats, the number of function
+# evaluations where that applies, and the peak memory allocated (tracemalloc, measured on a separate run)
+# Results are written as JSON (benchmarks/results.json unless --output is given), and compared against a stored baseline if one is given: a workload is a regression when
+# its time or peak memory grows by more than the threshold fraction (the exit status is then 1)
+# Usage: python -m benchmarks [--quick] [--repeats N] [--output FILE] [--baseline FILE] [--threshold FRACTION] [--filter TEXT]
+
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from fraction import frac
+import integration
+import linear
+import matrix
+from matrix import Matrix
+import ode
+
+class _Counter:
+    # Wraps a function to count its calls
+    def __init__(self, func : callable):
+        self.func = func
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.func(*args)
+
+def _random_matrix(n : int, rng : random.Random, dominant : bool = False) -> Matrix :
+    rows = [[rng.uniform(-1, 1) for _ in range(n)] for _ in range(n)]
+    if dominant:
+        for i in range(n): rows[i][i] += n
+    return Matrix(rows)
+
+def _tridiagonal(n : int) -> Matrix :
+    return Matrix([[4.0 if i == j else (-1.0 if abs(i - j) == 1 else 0.0) for j in range(n)] for i in range(n)])
+
+# Workloads, each a function of the size returning a zero argument callable, which returns the evaluation count (or None)
+
+def _harmonic(n : int) -> callable :
+    def run():
+        total = frac(0)
+        for k in range(1, n+1): total = total + frac(1, k)
+    return run
+
+def _multiply(n : int) -> callable :
+    rng = random.Random(n)
+    A, B = _random_matrix(n, rng), _random_matrix(n, rng)
+    return lambda: matrix.multiply(A, B, workers = 1) and None
+
+def _lu(n : int) -> callable :
+    A = _random_matrix(n, random.Random(n))
+    return lambda: matrix.LU_decompose(A) and None
+
+def _solve_dense(n : int) -> callable :
+    rng = random.Random(n)
+    A = _random_matrix(n, rng, dominant = True)
+    B = Matrix([[rng.random()] for _ in range(n)])
+    return lambda: linear.solve_system(A, B) and None
+
+def _solve_banded(n : int) -> callable :
+    A = _tridiagonal(n)
+    B = Matrix([[1.0] for _ in range(n)])
+    return lambda: linear.solve_system(A, B) and None
+
+def _integ(method : str) -> callable :
+    # Fixed step methods are sized by the number of panels, adaptive ones by -log10 of the tolerance
+    def workload(size : int) -> callable :
+        def run():
+            f = _Counter(lambda x: math.exp(-x)*math.sin(5*x))
+            if method in integration._adaptive_methods:
+                integration.integ(f, (0, 4), method, abs_tol = 10.0**-size, rel_tol = 10.0**-size)
+            else:
+                integration.integ(f, (0, 4), method, step = 4/size)
+            return f.calls
+        return run
+    return workload
+
+def _ode(method : str) -> callable :
+    # Damped oscillator over [0, 10], fixed step methods are sized by the number of steps, adaptive ones by -log10 of the tolerance
+    def workload(size : int) -> callable :
+        def run():
+            f = _Counter(lambda x, y, yd: -y - 0.1*yd)
+            if method in _adaptive_steppers:
+                ode.ode(2, method, f, (0, 10), [0, 1, 0], 0.1, 10.0**-size, final_only = True)
+            else:
+                ode.ode(2, method, f, (0, 10), [0, 1, 0], 10/size, final_only = True)
+            return f.calls
+        return run
+    return workload
+
+_adaptive_steppers = ("euler2", "dopri45", "bdf", "rosenbrock")
+
+# name -> (workload, sizes, quick sizes)
+_workloads = {
+    "fraction.harmonic"     : (_harmonic, [100, 400, 1600], [50, 100]),
+    "matrix.multiply"       : (_multiply, [32, 64, 128], [16, 32]),
+    "matrix.LU_decompose"   : (_lu, [32, 64, 128], [16, 32]),
+    "linear.solve_system"   : (_solve_dense, [32, 64, 128], [16, 32]),
+    "linear.solve_banded"   : (_solve_banded, [100, 400, 1600], [50, 100]),
+}
+for _method in integration._composite_rules:
+    _workloads[f"integration.{_method}"] = (_integ(_method), [1000, 10000, 100000], [100, 1000])
+for _method in integration._adaptive_methods:
+    _workloads[f"integration.{_method}"] = (_integ(_method), [6, 9, 12], [6, 9])
+for _method in ("euler", "heun", "rk2", "rk4"):
+    _workloads[f"ode.{_method}"] = (_ode(_method), [100, 1000, 10000], [100, 1000])
+for _method in _adaptive_steppers:
+    _workloads[f"ode.{_method}"] = (_ode(_method), [4, 6, 8], [4, 6])
+
+def _measure(run : callable, repeats : int) -> tuple[float, int|None, int] :
+    best = float("inf")
+    evals = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        evals = run()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, evals, peak
+
+def run(quick : bool = False, repeats : int = 3, only : str|None = None) -> dict :
+    results = []
+    for name, (workload, sizes, quick_sizes) in _workloads.items():
+        if only is not None and only not in name: continue
+        for size in (quick_sizes if quick else sizes):
+            seconds, evals, peak = _measure(workload(size), repeats)
+            results.append({"name" : name, "size" : size, "seconds" : seconds, "evals" : evals, "peak_bytes" : peak})
+    return {
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "time" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results" : results,
+    }
+
+# Peak memory differences below this many bytes are noise (interpreter caches, interned objects), not regressions
+_MEMORY_SLACK = 4096
+
+def compare(current : dict, baseline : dict, threshold : float = 0.2) -> list[dict] :
+    # Matches results on (name, size), returns the regressions with their time and memory ratios
+    base = {(r["name"], r["size"]) : r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["name"], r["size"]))
+        if old is None: continue
+        time_ratio = r["seconds"]/old["seconds"] if old["seconds"] > 0 else 1.0
+        memory_ratio = r["peak_bytes"]/old["peak_bytes"] if old["peak_bytes"] > 0 else 1.0
+        r["time_ratio"] = time_ratio
+        r["memory_ratio"] = memory_ratio
+        grew = r["peak_bytes"] - old["peak_bytes"] > _MEMORY_SLACK
+        if time_ratio > 1 + threshold or (grew and memory_ratio > 1 + threshold): regressions.append(r)
+    return regressions
+
+def _option(args : list, flag : str, default, cast = str):
+    if flag not in args: return default
+    i = args.index(flag)
+    value = cast(args[i+1])
+    del args[i:i+2]
+    return value
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    quick = "--quick" in args
+    if quick: args.remove("--quick")
+    repeats = _option(args, "--repeats", 3, int)
+    output = _option(args, "--output", os.path.join(os.path.dirname(__file__), "results.json"))
+    baseline_path = _option(args, "--baseline", None)
+    threshold = _option(args, "--threshold", 0.2, float)
+    only = _option(args, "--filter", None)
+    if args: raise SystemExit(f"Unknown arguments {args}")
+
+    current = run(quick, repeats, only)
+    regressions = []
+    if baseline_path is not None:
+        with open(baseline_path) as file: regressions = compare(current, json.load(file), threshold)
+    with open(output, "w") as file: json.dump(current, file, indent = 1)
+
+    print(f"{'workload':<28}{'size':>8}{'seconds':>12}{'evals':>10}{'peak KiB':>10}{'time x':>8}{'mem x':>8}")
+    for r in current["results"]:
+        evals = "" if r["evals"] is None else r["evals"]
+        ratios = f"{r['time_ratio']:>8.2f}{r['memory_ratio']:>8.2f}" if "time_ratio" in r else ""
+        print(f"{r['name']:<28}{r['size']:>8}{r['seconds']:>12.5f}{evals:>10}{r['peak_bytes']/1024:>10.1f}{ratios}")
+    print(f"Results written to {output}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {threshold:.0%}:")
+        for r in regressions: print(f"  {r['name']} size {r['size']}: time x{r['time_ratio']:.2f}, memory x{r['memory_ratio']:.2f}")
+        sys.exit(1)
@@ -0,0 +1,87 @@
+# Micro-benchmark for fraction.frac
+# Compares throughput against the original linear scan implementation and fractions.Fraction
+# Usage: python -m benchmarks.fraction_bench [repeats]
+
+import random
+import sys
+import timeit
+from fractions import Fraction
+
+from fraction import frac
+
+# Original implementation, kept only as a reference point for the benchmark
+
+class legacy_frac:
+    def __init__(self, num, den):
+        if den == 0: raise ZeroDivisionError("Denominator given is zero")
+        if num*den < 0: self.sign = -1
+        else: self.sign = 1
+        self.num , self.den = _legacy_reduce(abs(num), abs(den))
+
+    def __add__(self, other):
+        num = (self.sign*self.num*other.den) + (other.sign*other.num*self.den)
+        den = (self.den * other.den)
+        return legacy_frac(*_legacy_reduce(num, den))
+
+    def __mul__(self, other):
+        num, den = _legacy_reduce(self.num * other.num, self.den * other.den)
+        return legacy_frac(self.sign*other.sign*num, den)
+
+def _legacy_reduce(a, b):
+    hcf = a if a<b else b
+    while hcf > 0:
+        if a % hcf == 0 and b % hcf == 0: return int(a/hcf), int(b/hcf)
+        hcf -= 1
+    return 0, 1
+
+# Workloads, each returns the last value so nothing gets optimised away
+
+def _pairs(count, digits, seed = 0):
+    rng = random.Random(seed)
+    lo, hi = 10**(digits-1), 10**digits - 1
+    return [(rng.randint(-hi, hi), rng.randint(lo, hi)) for _ in range(count)]
+
+def _harmonic(cls, n):
+    total = cls(0, 1)
+    for k in range(1, n+1):
+        total = total + cls(1, k)
+    return total
+
+def _mixed_ops(cls, pairs):
+    # Independent products and sums, so operand sizes stay fixed at the given number of digits
+    vals = [cls(a, b) for a, b in pairs]
+    out = None
+    for i in range(len(vals)-2):
+        out = vals[i] * vals[i+1] + vals[i+2]
+    return out
+
+def _time(fn, repeats):
+    return min(timeit.repeat(fn, number = 1, repeat = repeats))
+
+def run(repeats : int = 3) -> list[tuple] :
+    # (workload, implementation, seconds)
+    results = []
+    impls = [("frac", frac), ("Fraction", Fraction), ("legacy", legacy_frac)]
+
+    for name, cls in impls:
+        results.append(("harmonic n=12", name, _time(lambda: _harmonic(cls, 12), repeats)))
+
+    small = _pairs(30, 2)
+    for name, cls in impls:
+        results.append(("mul-add 30 x 2 digit", name, _time(lambda: _mixed_ops(cls, small), repeats)))
+
+    # The legacy implementation scans down from the denominator, which is hopeless for these sizes
+    big = _pairs(2000, 30)
+    for name, cls in impls[:2]:
+        results.append(("mul-add 2000 x 30 digit", name, _time(lambda: _mixed_ops(cls, big), repeats)))
+
+    for name, cls in impls[:2]:
+        results.append(("harmonic n=2000", name, _time(lambda: _harmonic(cls, 2000), repeats)))
+
+    return results
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'workload':<26}{'impl':<10}{'seconds':>12}")
+    for workload, name, seconds in run(repeats):
+        print(f"{workload:<26}{name:<10}{seconds:>12.6f}")
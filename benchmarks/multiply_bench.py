@@ -0,0 +1,68 @@
+# Benchmark for matrix.multiply over a sweep of sizes
+# Times the original triple loop, the plain packed kernel, the tiled kernel and the process pool,
+# which shows where the automatic thresholds in matrix.multiply should sit on a given machine
+# Usage: python -m benchmarks.multiply_bench [sizes...] [--naive-max N] [--storage list|array]
+
+import os
+import random
+import sys
+import time
+
+import matrix
+from matrix import Matrix
+
+def naive_multiply(A : Matrix, B : Matrix) -> Matrix :
+    # The original implementation, kept only as a reference point for the benchmark
+    n, o = A.dimensions
+    m = B.dimensions[1]
+    C = matrix.zeroes(n, m)
+    for i in range(n):
+        for j in range(m):
+            for k in range(o):
+                C.vals[i][j] += A.vals[i][k] * B.vals[k][j]
+    return C
+
+def _random_matrix(n : int, rng : random.Random, storage : str) -> Matrix :
+    return Matrix([[rng.random() for _ in range(n)] for _ in range(n)], storage = storage)
+
+def _time(fn) -> float :
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def run(sizes : list[int], naive_max : int = 256, storage : str = "list") -> list[tuple] :
+    # (n, strategy, seconds), None where a strategy was skipped
+    rng = random.Random(0)
+    workers = os.cpu_count() or 1
+    results = []
+    for n in sizes:
+        A = _random_matrix(n, rng, storage)
+        B = _random_matrix(n, rng, storage)
+        strategies = [
+            ("naive", (lambda: naive_multiply(A, B)) if n <= naive_max else None),
+            ("plain", lambda: matrix.multiply(A, B, workers = 1, block_size = n)),
+            ("tiled", lambda: matrix.multiply(A, B, workers = 1, block_size = matrix._BLOCK_SIZE)),
+            (f"pool x{workers}", (lambda: matrix.multiply(A, B, workers = workers)) if workers > 1 else None),
+            ("auto", lambda: matrix.multiply(A, B)),
+        ]
+        for name, fn in strategies:
+            results.append((n, name, None if fn is None else _time(fn)))
+    return results
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    naive_max = 256
+    storage = "list"
+    if "--naive-max" in args:
+        i = args.index("--naive-max")
+        naive_max = int(args[i+1])
+        del args[i:i+2]
+    if "--storage" in args:
+        i = args.index("--storage")
+        storage = args[i+1]
+        del args[i:i+2]
+    sizes = [int(arg) for arg in args] or [64, 128, 256, 512, 1024]
+
+    print(f"{'n':>6}  {'strategy':<10}{'seconds':>12}")
+    for n, name, seconds in run(sizes, naive_max, storage):
+        print(f"{n:>6}  {name:<10}{'skipped' if seconds is None else f'{seconds:.4f}':>12}")
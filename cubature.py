@@ -0,0 +1,210 @@
+# Multidimensional integration over boxes, bounds = [(a1, b1), (a2, b2), ...]
+# eqn takes one argument per dimension, eqn(x, y, z, ...), or with vectorized = True a list of points
+# (tuples) per batch, returning a sequence of values
+# Every method returns (estimate, standard error, number of integrand evaluations)
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import product
+from math import cos, fsum, pi, prod, sqrt
+import pickle
+import random
+
+# Tensor product Gauss-Legendre, for smooth integrands in low dimension
+
+@lru_cache(maxsize = None)
+def gauss_legendre(n : int) -> tuple[tuple[float, ...], tuple[float, ...]] :
+    # Nodes and weights of the n point rule on [-1, 1], roots of P_n found by Newton's method
+    nodes = []
+    weights = []
+    for i in range(1, n+1):
+        x = cos(pi*(i - 0.25)/(n + 0.5))
+        for _ in range(100):
+            # Recurrence for P_n(x) and P_(n-1)(x)
+            p0, p1 = 1.0, x
+            for k in range(2, n+1):
+                p0, p1 = p1, ((2*k - 1)*x*p1 - (k - 1)*p0)/k
+            dp = n*(x*p1 - p0)/(x*x - 1) if n > 1 else 1.0
+            dx = p1/dp
+            x -= dx
+            if abs(dx) < 1e-16: break
+        p0, p1 = 1.0, x
+        for k in range(2, n+1):
+            p0, p1 = p1, ((2*k - 1)*x*p1 - (k - 1)*p0)/k
+        dp = n*(x*p1 - p0)/(x*x - 1) if n > 1 else 1.0
+        nodes.append(x)
+        weights.append(2/((1 - x*x)*dp*dp))
+    return tuple(nodes), tuple(weights)
+
+def _tensor_rule(eqn : callable, bounds : list[tuple[float, float]], points : int, vectorized : bool) -> float :
+    nodes, weights = gauss_legendre(points)
+    axes = []
+    for a, b in bounds:
+        half, mid = (b - a)/2, (a + b)/2
+        axes.append([(mid + half*x, half*w) for x, w in zip(nodes, weights)])
+    grid = list(product(*axes))
+    xs = [tuple(x for x, _ in node) for node in grid]
+    ws = [prod(w for _, w in node) for node in grid]
+    fvals = eqn(xs) if vectorized else [eqn(*x) for x in xs]
+    return fsum(w*f for w, f in zip(ws, fvals))
+
+def tensor_gauss(eqn : callable, bounds : list[tuple[float, float]], points : int = 10, vectorized : bool = False, max_evals : int = 10**7) -> tuple[float, float, int] :
+    # points^d nodes, the error is estimated against the (points-1)^d rule
+    dims = len(bounds)
+    evals = points**dims + (points - 1)**dims
+    if evals > max_evals: raise ValueError(f"{points}^{dims} nodes exceeds max_evals = {max_evals}, use Monte Carlo for this dimension")
+    value = _tensor_rule(eqn, bounds, points, vectorized)
+    coarse = _tensor_rule(eqn, bounds, points - 1, vectorized) if points > 1 else value
+    return value, abs(value - coarse), evals
+
+# Batches are reduced to (count, mean, M2) and merged with Chan's parallel update, so no samples are kept
+
+def _batch_stats(fvals : list) -> tuple[int, float, float] :
+    n = len(fvals)
+    mean = fsum(fvals)/n
+    return n, mean, fsum((f - mean)**2 for f in fvals)
+
+def _merge_stats(a : tuple[int, float, float], b : tuple[int, float, float]) -> tuple[int, float, float] :
+    na, mean_a, m2_a = a
+    nb, mean_b, m2_b = b
+    if na == 0: return b
+    n = na + nb
+    delta = mean_b - mean_a
+    return n, mean_a + delta*nb/n, m2_a + m2_b + delta*delta*na*nb/n
+
+def _evaluate_points(eqn : callable, bounds : list[tuple[float, float]], units : list[tuple], vectorized : bool) -> list :
+    points = [tuple(a + u*(b - a) for u, (a, b) in zip(unit, bounds)) for unit in units]
+    return list(eqn(points)) if vectorized else [eqn(*x) for x in points]
+
+def _picklable(*objects) -> bool :
+    try:
+        pickle.dumps(objects)
+        return True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+def _run_batches(func : callable, tasks : list[tuple], workers : int) :
+    # Results come back in task order either way, so the answer doesn't depend on the number of workers
+    # Lambdas and closures (the usual eqn) can't be sent to worker processes, the batches then run serially
+    if workers <= 1 or not tasks or not _picklable(tasks[0]): return (func(*task) for task in tasks)
+    try:
+        executor = ProcessPoolExecutor(workers)
+    except OSError:
+        return (func(*task) for task in tasks)
+    try:
+        return list(executor.map(func, *zip(*tasks)))
+    except (OSError, BrokenProcessPool, pickle.PicklingError):
+        return [func(*task) for task in tasks]
+    finally:
+        executor.shutdown()
+
+def _base_seed(seed : int|None) -> int :
+    return random.SystemRandom().getrandbits(64) if seed is None else seed
+
+# Plain Monte Carlo
+
+def _plain_batch(eqn : callable, bounds : list[tuple[float, float]], size : int, seed : str, vectorized : bool) -> tuple[int, float, float] :
+    rng = random.Random(seed)
+    dims = len(bounds)
+    units = [tuple(rng.random() for _ in range(dims)) for _ in range(size)]
+    return _batch_stats(_evaluate_points(eqn, bounds, units, vectorized))
+
+def monte_carlo(eqn : callable, bounds : list[tuple[float, float]], samples : int = 100000, batch : int = 4096, seed : int|None = None, workers : int = 1, vectorized : bool = False) -> tuple[float, float, int] :
+    # Each batch draws from its own generator seeded with (seed, batch index), so results are reproducible for a given
+    # seed no matter how batches are spread over workers (only used when eqn is picklable)
+    volume = prod(b - a for a, b in bounds)
+    base = _base_seed(seed)
+    tasks = [(eqn, bounds, min(batch, samples - start), f"{base}:{i}", vectorized) for i, start in enumerate(range(0, samples, batch))]
+    stats = (0, 0.0, 0.0)
+    for part in _run_batches(_plain_batch, tasks, workers):
+        stats = _merge_stats(stats, part)
+    n, mean, m2 = stats
+    std_error = sqrt(m2/(n - 1)/n) if n > 1 else float("inf")
+    return volume*mean, volume*std_error, n
+
+# Quasi Monte Carlo, low discrepancy sequences
+
+_primes = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97, 101, 103, 107, 109, 113)
+
+def _radical_inverse(i : int, base : int) -> float :
+    out = 0.0
+    scale = 1/base
+    while i:
+        i, digit = divmod(i, base)
+        out += digit*scale
+        scale /= base
+    return out
+
+def halton(start : int, count : int, dims : int) -> list[tuple] :
+    if dims > len(_primes): raise ValueError(f"Halton sequence is only available up to {len(_primes)} dimensions")
+    # Index 0 is the origin in every dimension, so the sequence starts at 1
+    return [tuple(_radical_inverse(i, _primes[d]) for d in range(dims)) for i in range(start+1, start+count+1)]
+
+# Sobol direction numbers (Joe & Kuo, new-joe-kuo-6.21201) for dimensions 2 onwards: (degree s, coefficients a, initial m)
+_sobol_params = (
+    (1, 0, (1,)), (2, 1, (1, 3)), (3, 1, (1, 3, 1)), (3, 2, (1, 1, 1)), (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)), (5, 2, (1, 1, 5, 5, 17)), (5, 4, (1, 1, 5, 5, 5)), (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)), (5, 13, (1, 1, 1, 3, 11)), (5, 14, (1, 3, 5, 5, 31)),
+)
+_SOBOL_BITS = 32
+
+@lru_cache(maxsize = None)
+def _sobol_directions(dims : int) -> tuple[tuple[int, ...], ...] :
+    if dims > len(_sobol_params) + 1: raise ValueError(f"Sobol sequence is only available up to {len(_sobol_params) + 1} dimensions, use halton")
+    out = [tuple(1 << (_SOBOL_BITS - 1 - k) for k in range(_SOBOL_BITS))]
+    for s, a, m in _sobol_params[:dims-1]:
+        v = [m[k] << (_SOBOL_BITS - 1 - k) for k in range(s)]
+        for k in range(s, _SOBOL_BITS):
+            val = v[k-s] ^ (v[k-s] >> s)
+            for j in range(1, s):
+                if (a >> (s - 1 - j)) & 1: val ^= v[k-j]
+            v.append(val)
+        out.append(tuple(v))
+    return tuple(out)
+
+def sobol(start : int, count : int, dims : int) -> list[tuple] :
+    directions = _sobol_directions(dims)
+    scale = 2.0**-_SOBOL_BITS
+    # Jump straight to point start via its Gray code, then step through the sequence one bit flip at a time
+    gray = start ^ (start >> 1)
+    state = [0]*dims
+    for d in range(dims):
+        bit = 0
+        g = gray
+        while g:
+            if g & 1: state[d] ^= directions[d][bit]
+            g >>= 1
+            bit += 1
+    out = []
+    for i in range(start, start+count):
+        out.append(tuple(x*scale for x in state))
+        # The bit that flips between Gray codes of i and i+1 is the lowest zero bit of i
+        bit = ((~i) & (i+1)).bit_length() - 1
+        for d in range(dims): state[d] ^= directions[d][bit]
+    return out
+
+_sequences = {"sobol" : sobol, "halton" : halton}
+
+def _qmc_batch(eqn : callable, bounds : list[tuple[float, float]], sequence : str, start : int, size : int, shift : tuple, vectorized : bool) -> float :
+    units = [tuple((u + s) % 1.0 for u, s in zip(unit, shift)) for unit in _sequences[sequence](start, size, len(bounds))]
+    return fsum(_evaluate_points(eqn, bounds, units, vectorized))
+
+def quasi_monte_carlo(eqn : callable, bounds : list[tuple[float, float]], samples : int = 65536, sequence : str = "sobol", replicates : int = 16, batch : int = 4096, seed : int|None = None, workers : int = 1, vectorized : bool = False) -> tuple[float, float, int] :
+    # Randomised QMC, every replicate uses the same sequence under its own random shift (mod 1), and the spread of the
+    # replicate means gives the standard error
+    sequence = sequence.lower()
+    if sequence not in _sequences: raise ValueError(f"Unknown sequence {sequence}, expected one of {tuple(_sequences)}")
+    if replicates < 2: raise ValueError("At least 2 replicates are needed to estimate the standard error")
+    volume = prod(b - a for a, b in bounds)
+    per_replicate = max(1, samples // replicates)
+    rng = random.Random(_base_seed(seed))
+    shifts = [tuple(rng.random() for _ in bounds) for _ in range(replicates)]
+
+    tasks = [(eqn, bounds, sequence, start, min(batch, per_replicate - start), shift, vectorized) for shift in shifts for start in range(0, per_replicate, batch)]
+    batches_per_replicate = len(tasks) // replicates
+    sums = list(_run_batches(_qmc_batch, tasks, workers))
+    means = [fsum(sums[r*batches_per_replicate : (r+1)*batches_per_replicate])/per_replicate for r in range(replicates)]
+
+    n, mean, m2 = _batch_stats(means)
+    return volume*mean, volume*sqrt(m2/(n - 1)/n), per_replicate*replicates
@@ -1,77 +1,205 @@
 # Class for fractions
 
+from math import gcd
+import sys
+
+# Constants for hashing fractions the same way python hashes int, float and fractions.Fraction
+_HASH_MODULUS = sys.hash_info.modulus
+_HASH_INF = sys.hash_info.inf
+
 class frac:
-    def __init__(self, num, den):
+    # The value is stored as a signed numerator and a positive denominator, always in lowest terms
+    __slots__ = ("_num", "_den")
+
+    def __init__(self, num : int, den : int = 1):
+        if type(num) is not int or type(den) is not int: raise TypeError(f"Expected integer arguments, got {type(num)} and {type(den)}")
         if den == 0: raise ZeroDivisionError("Denominator given is zero")
-        if num*den < 0: self.sign = -1
-        else: self.sign = 1
-        self.num , self.den = _reduce_frac(abs(num), abs(den))
-    
-    def __str__(self):
-        if self.den == 1: return str(self.num)
-        out = ""
-        if self.sign == -1: out += "-"
-        out += str(self.num)+"/"+str(self.den)
+        if den < 0: num, den = -num, -den
+        g = gcd(num, den)
+        if g != 1: num, den = num//g, den//g
+        self._num = num
+        self._den = den
+
+    @classmethod
+    def _new(cls, num : int, den : int):
+        # Skips validation and reduction, callers must pass a reduced fraction with den > 0
+        out = object.__new__(cls)
+        out._num = num
+        out._den = den
         return out
-    
+
+    @property
+    def num(self):
+        return abs(self._num)
+
+    @property
+    def den(self):
+        return self._den
+
+    @property
+    def sign(self):
+        return -1 if self._num < 0 else 1
+
+    def __str__(self):
+        if self._den == 1: return str(self._num)
+        return str(self._num)+"/"+str(self._den)
+
+    def __repr__(self):
+        return f"frac({self._num}, {self._den})"
+
+    def __float__(self):
+        return self._num / self._den
+
+    def __int__(self):
+        # Truncates towards zero, like int(float)
+        if self._num < 0: return -(-self._num // self._den)
+        return self._num // self._den
+
+    def __bool__(self):
+        return self._num != 0
+
+    def __hash__(self):
+        # Same algorithm as fractions.Fraction, so that hash(frac(n, 1)) == hash(n)
+        dinv = pow(self._den, -1, _HASH_MODULUS) if self._den % _HASH_MODULUS else 0
+        if dinv == 0: h = _HASH_INF
+        else: h = (abs(self._num) % _HASH_MODULUS) * dinv % _HASH_MODULUS
+        h = h if self._num >= 0 else -h
+        return -2 if h == -1 else h
+
+    # Comparisons
+
     def __eq__(self, other):
-        if type(other) is int: other = frac(other, 1)
-        return type(self)==type(other) and self.num == other.num and self.den == other.den
-    
+        if type(other) is frac: return self._num == other._num and self._den == other._den
+        if type(other) is int: return self._den == 1 and self._num == other
+        return NotImplemented
+
+    def _cmp_key(self, other):
+        # Returns the two cross multiplied numerators to compare, or None for unsupported types
+        if type(other) is frac: return self._num * other._den, other._num * self._den
+        if type(other) is int: return self._num, other * self._den
+        return None
+
+    def __lt__(self, other):
+        key = self._cmp_key(other)
+        if key is None: return NotImplemented
+        return key[0] < key[1]
+
+    def __le__(self, other):
+        key = self._cmp_key(other)
+        if key is None: return NotImplemented
+        return key[0] <= key[1]
+
+    def __gt__(self, other):
+        key = self._cmp_key(other)
+        if key is None: return NotImplemented
+        return key[0] > key[1]
+
+    def __ge__(self, other):
+        key = self._cmp_key(other)
+        if key is None: return NotImplemented
+        return key[0] >= key[1]
+
+    # Unary operators
+
+    def __neg__(self):
+        return frac._new(-self._num, self._den)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return frac._new(abs(self._num), self._den)
+
+    # Arithmetic
+
     def __add__(self, other):
-        if type(other) is int:
-            other = frac(other, 1)
-        if type(other) is frac:
-            num = (self.sign*self.num*other.den) + (other.sign*other.num*self.den)
-            den = (self.den * other.den)
-            return frac(*_reduce_frac(num, den))
-        raise TypeError(f"Cannot add variables of type {type(self)} and {type(other)}")
-    
+        if type(other) is frac: return _add(self._num, self._den, other._num, other._den)
+        # gcd(n + k*d, d) = gcd(n, d) = 1, so adding an integer never needs a reduction
+        if type(other) is int: return frac._new(self._num + other*self._den, self._den)
+        return NotImplemented
+
+    __radd__ = __add__
+
     def __sub__(self, other):
-        if type(other) is int:
-            other = frac(other, 1)
-        if type(other) is frac:
-            num = (self.sign*self.num*other.den) - (other.sign*other.num*self.den)
-            den = (self.den * other.den)
-            return frac(*_reduce_frac(num, den))
-        raise TypeError(f"Cannot subtract variables of type {type(self)} and {type(other)}")
-    
+        if type(other) is frac: return _add(self._num, self._den, -other._num, other._den)
+        if type(other) is int: return frac._new(self._num - other*self._den, self._den)
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if type(other) is int: return frac._new(other*self._den - self._num, self._den)
+        return NotImplemented
+
     def __mul__(self, other):
+        if type(other) is frac: return _mul(self._num, self._den, other._num, other._den)
         if type(other) is int:
-            other = frac(other, 1)
-        if type(other) is frac:
-            num = self.num * other.num
-            den = self.den * other.den
-            num, den = _reduce_frac(num, den)
-            return frac(self.sign*other.sign*num, den)
-        raise TypeError(f"Cannot multiply variables of type {type(self)} and {type(other)}")
-    
+            g = gcd(other, self._den)
+            if g == 1: return frac._new(self._num*other, self._den)
+            return frac._new(self._num*(other//g), self._den//g)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
     def __truediv__(self, other):
-        if type(other) is int:
-            other = frac(other, 1)
         if type(other) is frac:
-            num = self.num * other.den
-            den = self.den * other.num
-            num, den = _reduce_frac(num, den)
-            return frac(self.sign*other.sign*num, den)
-        raise TypeError(f"Cannot divide variables of type {type(self)} and {type(other)}")
+            if other._num == 0: raise ZeroDivisionError("Division by zero fraction")
+            if other._num < 0: return _mul(self._num, self._den, -other._den, -other._num)
+            return _mul(self._num, self._den, other._den, other._num)
+        if type(other) is int:
+            if other == 0: raise ZeroDivisionError("Division by zero")
+            g = gcd(self._num, other)
+            num, den = self._num//g, self._den*(other//g)
+            if den < 0: num, den = -num, -den
+            return frac._new(num, den)
+        return NotImplemented
+
+    def __rtruediv__(self, other):
+        if type(other) is int:
+            if self._num == 0: raise ZeroDivisionError("Division by zero fraction")
+            g = gcd(other, self._num)
+            num, den = (other//g)*self._den, self._num//g
+            if den < 0: num, den = -num, -den
+            return frac._new(num, den)
+        return NotImplemented
+
+    def __pow__(self, power):
+        if type(power) is not int: return NotImplemented
+        if power >= 0: return frac._new(self._num**power, self._den**power)
+        if self._num == 0: raise ZeroDivisionError("Cannot raise zero fraction to a negative power")
+        num, den = self._den**-power, self._num**-power
+        if den < 0: num, den = -num, -den
+        return frac._new(num, den)
+
+
+# Arithmetic on (numerator, denominator) pairs, both arguments must already be reduced with positive denominators
+
+def _add(n1 : int, d1 : int, n2 : int, d2 : int) -> frac :
+    # Only the gcd of the denominators can divide the new numerator (Knuth, TAOCP 4.5.1)
+    g = gcd(d1, d2)
+    if g == 1: return frac._new(n1*d2 + n2*d1, d1*d2)
+    s = d1 // g
+    t = n1*(d2//g) + n2*s
+    g2 = gcd(t, g)
+    if g2 == 1: return frac._new(t, s*d2)
+    return frac._new(t//g2, s*(d2//g2))
 
+def _mul(n1 : int, d1 : int, n2 : int, d2 : int) -> frac :
+    # Cross cancel before multiplying, so the products are already in lowest terms
+    g1 = gcd(n1, d2)
+    if g1 > 1: n1, d2 = n1//g1, d2//g1
+    g2 = gcd(n2, d1)
+    if g2 > 1: n2, d1 = n2//g2, d1//g2
+    return frac._new(n1*n2, d1*d2)
 
 def _lcm(a : int, b : int) -> int:
     if type(a) is not int or type(b) is not int: raise TypeError(f"Expected integer arguments, got {type(a)} and {type(b)}")
-    lcm = int(a) if a>b else int(b)
-    while True:
-        if lcm % a == 0 and lcm % b == 0: return int(lcm)
-        lcm += 1
+    if a == 0 or b == 0: return 0
+    return abs(a // gcd(a, b) * b)
 
 def _hcf(a : int, b : int) -> int:
     if type(a) is not int or type(b) is not int: raise TypeError(f"Expected integer arguments, got {type(a)} and {type(b)}")
-    hcf = int(a) if a<b else int(b)
-    while hcf > 0:
-        if a % hcf == 0 and b % hcf == 0: return int(hcf)
-        hcf -= 1
+    return gcd(a, b)
 
 def _reduce_frac(a : int, b : int):
     hcf = _hcf(a,b)
-    if hcf == None: return 0,1
-    return int(a/hcf), int(b/hcf)
\ No newline at end of file
+    if hcf == 0: return 0,1
+    return a//hcf, b//hcf
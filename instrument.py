@@ -0,0 +1,88 @@
+# Opt-in instrumentation for the solvers
+# Inside a profile() block every Stats object on the active stack collects
+#   evals       - calls of user functions (integrands, ODE right hand sides), by label
+#   steps       - accepted ODE steps, with a histogram of their sizes by power of 2
+#   rejected    - steps thrown away by the adaptive ODE methods
+#   counters    - other solver events (e.g. Jacobian evaluations)
+#   timings     - number of calls and total seconds of LU factorizations, substitutions and linear solves
+# With no profile active the hooks reduce to one check of the module level _active list, and user functions
+# aren't wrapped at all
+
+from contextlib import contextmanager
+from functools import wraps
+from math import frexp
+import time
+
+# Stack of Stats currently collecting, a nested profile() also reports to the ones around it
+_active = []
+
+class Stats:
+    def __init__(self):
+        self.evals = {}
+        self.steps = 0
+        self.rejected = 0
+        self.step_sizes = {}
+        self.counters = {}
+        self.timings = {}
+
+    def histogram(self) -> list[tuple[float, int]] :
+        # (lower edge, count) of every bucket [2^k, 2^(k+1)) holding a step size
+        return [(2.0**(k-1), count) for k, count in sorted(self.step_sizes.items())]
+
+    def __repr__(self):
+        out = "Stats("
+        out += f"evals={self.evals}, steps={self.steps}, rejected={self.rejected}"
+        if self.counters: out += f", counters={self.counters}"
+        if self.timings: out += ", timings={" + ", ".join(f"{name}: {calls} calls {seconds:.6f}s" for name, (calls, seconds) in self.timings.items()) + "}"
+        return out + ")"
+
+@contextmanager
+def profile():
+    # with profile() as stats: ...
+    stats = Stats()
+    _active.append(stats)
+    try:
+        yield stats
+    finally:
+        _active.remove(stats)
+
+def counted(func : callable, label : str = "evals", batch : bool = False) -> callable :
+    # Wraps func to count its calls while profiling, with batch = True the first argument is a sequence of points and
+    # every point counts. Returns func itself when nothing is being profiled
+    if not _active: return func
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        k = len(args[0]) if batch else 1
+        for stats in _active: stats.evals[label] = stats.evals.get(label, 0) + k
+        return func(*args, **kwargs)
+    return wrapper
+
+def record(key : str, k : int = 1):
+    for stats in _active: stats.counters[key] = stats.counters.get(key, 0) + k
+
+def step(h : float):
+    if not _active: return
+    bucket = frexp(abs(h))[1]
+    for stats in _active:
+        stats.steps += 1
+        stats.step_sizes[bucket] = stats.step_sizes.get(bucket, 0) + 1
+
+def reject():
+    for stats in _active: stats.rejected += 1
+
+def timed(name : str) -> callable :
+    # Decorator accumulating the calls and wall time of a function while profiling
+    def decorator(func : callable) -> callable :
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active: return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                for stats in _active:
+                    calls, seconds = stats.timings.get(name, (0, 0.0))
+                    stats.timings[name] = (calls + 1, seconds + elapsed)
+        return wrapper
+    return decorator
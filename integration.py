@@ -1,26 +1,89 @@
-# General integrator for finite bounds 
-def integ(eqn : callable, bounds : tuple[float, float], method : str = "simp38", step : float = 0.001, return_list : bool = False):
-    base_method = globals()[method.lower()]
+import heapq
+from math import ceil, fsum
+import operator
 
-    out = 0
-    x = bounds[0]
+import instrument
 
+# Composite Newton-Cotes rules
+# Each rule splits a panel of width step into k equal parts, and weights its k+1 nodes (as a fraction of step)
+# Neighbouring panels share their end nodes, so the whole range is sampled once on the grid x = a + j*step/k
+_composite_rules = {
+    "rect"   : (1, (1, 0)),
+    "trapez" : (1, (1/2, 1/2)),
+    "simp13" : (2, (1/6, 4/6, 1/6)),
+    "simp38" : (3, (1/8, 3/8, 3/8, 1/8)),
+}
+
+def _panel_count(bounds : tuple[float, float], step : float) -> int :
+    # Number of panels a + i*step with a + i*step < b, without the drift of accumulating x += step
+    span = (bounds[1] - bounds[0])/step
+    if span <= 0: return 0
+    nearest = round(span)
+    if abs(span - nearest) <= 1e-9*max(1, span): return nearest
+    return ceil(span)
+
+def _evaluate(eqn : callable, xs : list[float], vectorized : bool, batch : int) -> list :
+    if not vectorized: return list(map(eqn, xs))
+    # eqn takes a sequence of points and returns a sequence of values
+    out = []
+    for start in range(0, len(xs), batch):
+        out.extend(eqn(xs[start : start+batch]))
+    return out
+
+def _running_sum(vals : list) -> list :
+    # Cumulative sums starting from 0, with Neumaier compensation so rounding errors don't build up over many panels
+    out = [0]
+    total = 0.0
+    comp = 0.0
+    for val in vals:
+        t = total + val
+        if abs(total) >= abs(val): comp += (total - t) + val
+        else: comp += (val - t) + total
+        total = t
+        out.append(total + comp)
+    return out
+
+# General integrator for finite bounds
+# Fixed step methods: rect, trapez, simp13, simp38
+# Adaptive methods (step and return_list don't apply, extra keyword arguments go to the method): gk15, romberg
+# return_stats = True returns (result, instrument.Stats) with the number of integrand evaluations
+def integ(eqn : callable, bounds : tuple[float, float], method : str = "simp38", step : float = 0.001, return_list : bool = False, vectorized : bool = False, batch : int = 4096, return_stats : bool = False, **kwargs):
+    if return_stats:
+        with instrument.profile() as stats:
+            out = integ(eqn, bounds, method, step, return_list, vectorized, batch, **kwargs)
+        return out, stats
+    eqn = instrument.counted(eqn, batch = vectorized)
+    method = method.lower()
+    if method in _adaptive_methods:
+        if return_list: raise ValueError(f"return_list is not supported by the adaptive method {method}")
+        return _adaptive_methods[method](eqn, bounds, **kwargs)[0]
+    if method not in _composite_rules: return _integ_panels(eqn, bounds, globals()[method], step, return_list)
+
+    k, weights = _composite_rules[method]
+    n = _panel_count(bounds, step)
+    if n == 0: return [0] if return_list else 0
+
+    # Every node is evaluated exactly once, the last one is skipped if no panel uses it (rect)
+    a = bounds[0]
+    sub = step/k
+    count = n*k + (1 if weights[-1] else 0)
+    fvals = _evaluate(eqn, [a + j*sub for j in range(count)], vectorized, batch)
+
+    # Values at node r of every panel are the strided slice fvals[r::k]
+    offsets = [(r, w) for r, w in enumerate(weights) if w]
     if return_list:
-        out_vals = []
-        idx = 0
-        while x < bounds[1]:
-            out_vals.append(out)
-            idx += 1
-            out += base_method(eqn, x, step)
-            x += step
-        out_vals.append(out)
-        return out_vals
-    
-    else:    
-        while x < bounds[1]:
-            out += base_method(eqn, x, step)
-            x += step
-        return out
+        columns = [fvals[r : r + n*k : k] for r, _ in offsets]
+        coeffs = [w*step for _, w in offsets]
+        panels = [fsum(map(operator.mul, coeffs, vals)) for vals in zip(*columns)]
+        return _running_sum(panels)
+    return step*fsum(w*fsum(fvals[r : r + n*k : k]) for r, w in offsets)
+
+def _integ_panels(eqn : callable, bounds : tuple[float, float], base_method : callable, step : float, return_list : bool):
+    # Fallback for rules without a shared-node form, one call to base_method per panel
+    n = _panel_count(bounds, step)
+    panels = [base_method(eqn, bounds[0] + i*step, step) for i in range(n)]
+    if return_list: return _running_sum(panels)
+    return fsum(panels)
 
 # Methods for integration
 
@@ -34,4 +97,103 @@ def simp13(eqn : callable, x : float, step : float):
     return step*(eqn(x) + 4*eqn(x+(step/2)) + eqn(x + (step)))/6
 
 def simp38(eqn : callable, x : float, step : float):
-    return 3*step*(eqn(x) + 3*eqn(x+(step/3)) + 3*eqn(x+(2*step/3)) + eqn(x + (step)))/8
\ No newline at end of file
+    # 3h/8 (f0 + 3f1 + 3f2 + f3) with h = step/3 the spacing between nodes
+    return step*(eqn(x) + 3*eqn(x+(step/3)) + 3*eqn(x+(2*step/3)) + eqn(x + (step)))/8
+
+# Adaptive Gauss-Kronrod quadrature
+
+# 15 point Kronrod rule with its embedded 7 point Gauss rule, nodes on [-1, 1] (QUADPACK qk15)
+_xgk = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+        0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+        0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+        0.207784955007898467600689403773245, 0.000000000000000000000000000000000)
+_wgk = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+        0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+        0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+        0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+_wg = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+# Expanded once at import to all 15 nodes, with the Gauss weight of each node (0 for Kronrod-only nodes)
+_gk15_nodes = tuple(-x for x in _xgk[:-1]) + _xgk[::-1]
+_gk15_kronrod = _wgk[:-1] + _wgk[::-1]
+_g7_at = {1 : _wg[0], 3 : _wg[1], 5 : _wg[2], 7 : _wg[3]}
+_gk15_gauss = tuple(_g7_at.get(i, 0.0) for i in range(7)) + tuple(_g7_at.get(i, 0.0) for i in range(7, -1, -1))
+
+def _gk15(eqn : callable, a : float, b : float) -> tuple[float, float] :
+    # Kronrod estimate and |Kronrod - Gauss| as its error estimate
+    half = (b - a)/2
+    mid = (a + b)/2
+    fvals = [eqn(mid + half*x) for x in _gk15_nodes]
+    kronrod = half*fsum(map(operator.mul, _gk15_kronrod, fvals))
+    gauss = half*fsum(map(operator.mul, _gk15_gauss, fvals))
+    return kronrod, abs(kronrod - gauss)
+
+def gauss_kronrod(eqn : callable, bounds : tuple[float, float], abs_tol : float = 1e-10, rel_tol : float = 1e-10, max_evals : int = 100000) -> tuple[float, float, int] :
+    # Returns (value, error estimate, number of integrand evaluations)
+    # The subinterval with the largest error is always split next, until the total error meets
+    # max(abs_tol, rel_tol*|value|) or another split would exceed max_evals
+    a, b = bounds
+    if a == b: return 0.0, 0.0, 0
+    value, error = _gk15(eqn, a, b)
+    evals = 15
+    # heapq is a min-heap, so intervals are keyed on -error
+    heap = [(-error, a, b, value)]
+    while error > max(abs_tol, rel_tol*abs(value)) and evals + 30 <= max_evals:
+        _, lo, hi, _ = heapq.heappop(heap)
+        mid = (lo + hi)/2
+        for left, right in ((lo, mid), (mid, hi)):
+            part, part_err = _gk15(eqn, left, right)
+            heapq.heappush(heap, (-part_err, left, right, part))
+        evals += 30
+        # Re-summing keeps the totals free of cancellation from repeatedly adding and removing parts
+        value = fsum(item[3] for item in heap)
+        error = fsum(-item[0] for item in heap)
+    return value, error, evals
+
+# Romberg integration
+
+def romberg(eqn : callable, bounds : tuple[float, float], abs_tol : float = 1e-10, rel_tol : float = 1e-10, max_levels : int = 20, min_levels : int = 4, cache : dict|None = None) -> tuple[float, float, int, int] :
+    # Returns (value, error estimate, number of integrand evaluations, evaluations saved versus naive refinement)
+    # Level k is the trapezoid rule on 2^k panels, refined by Richardson extrapolation row by row
+    # Nodes are memoized as a + j*(b-a)/2^k with j odd, so a node is never evaluated twice, and passing
+    # the same cache dict to a later call (same eqn and bounds) reuses every node evaluated before
+    a, b = bounds
+    cache = {} if cache is None else cache
+    evals = 0
+
+    def f(j : int, level : int) -> float :
+        nonlocal evals
+        while j and j % 2 == 0 and level:
+            j //= 2
+            level -= 1
+        key = (j, level) if j else (0, 0)
+        if key not in cache:
+            cache[key] = eqn(a + j*(b - a)/2**level)
+            evals += 1
+        return cache[key]
+
+    width = b - a
+    rows = [[width*(f(0, 0) + f(1, 0))/2]]
+    naive = 2
+    error = float("inf")
+    for level in range(1, max_levels+1):
+        # Only the midpoints of the previous level's panels are new
+        h = width/2**level
+        trapezoid = rows[-1][0]/2 + h*fsum(f(j, level) for j in range(1, 2**level, 2))
+        naive += 2**level + 1
+
+        row = [trapezoid]
+        factor = 1
+        for m in range(1, level+1):
+            factor *= 4
+            row.append(row[m-1] + (row[m-1] - rows[-1][m-1])/(factor - 1))
+        error = abs(row[-1] - rows[-1][-1])
+        rows.append(row)
+        if level >= min_levels and error <= max(abs_tol, rel_tol*abs(row[-1])): break
+    return rows[-1][-1], error, evals, naive - evals
+
+_adaptive_methods = {
+    "gk15"    : gauss_kronrod,
+    "romberg" : romberg,
+}
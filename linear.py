@@ -1,33 +1,426 @@
 # Script to solve system of linear equations
 
+from itertools import repeat
+import math
+import operator
+
+import instrument
 import matrix
 from matrix import Matrix
+from sparse import SparseMatrix
+
+# Systems whose bandwidth (lower + upper + 1) is at most this fraction of n are solved as banded systems
+_BANDED_FRACTION = 0.25
 
-def solve_system(A : Matrix, B : Matrix) -> Matrix :
+@instrument.timed("solve_system")
+def solve_system(A : Matrix, B : Matrix, method : str = "auto") -> Matrix :
+    if isinstance(A, BandedMatrix): return banded_solve(A, B)
     n, m = A.dimensions
     d, e = B.dimensions
     if not n == d: raise ValueError(f"Dimensions of A and B are incompatible, got ({n}x{m}) and ({d}x{e})")
 
-    P, L, U = matrix.LU_decompose(A)
+    method = method.lower()
+    # Exact rational solution using fraction-free elimination, for int/frac/float entries
+    if method == "exact": return matrix.exact_solve(A, B)
+    if method == "auto": method = _pick_method(A)
+
+    if method == "diagonal": return diagonal_solve(A, B)
+    if method == "permutation": return permutation_solve(A, B)
+    if method == "upper": return back_substitution(A, B)
+    if method == "lower": return forward_substitution(A, B)
+    if method == "banded": return banded_solve(BandedMatrix.from_matrix(A), B)
+    if method == "cholesky":
+        try:
+            return cholesky_solve(matrix.cholesky_decompose(A), B)
+        except ValueError:
+            # Symmetric but not positive definite
+            method = "lu"
+    if method != "lu": raise ValueError(f"Unknown method {method}, expected 'auto', 'lu', 'cholesky', 'banded', 'upper', 'lower', 'diagonal', 'permutation' or 'exact'")
+
     # AX = B,   PA = LU,    PAX = PB = LUX, UX = Y, LY = PB
-    # Solve LY = B and UX = Y using forward and backward substitution respectively
-    Y = matrix.zeroes(d,e)
-    X = matrix.zeroes(d,e)
+    # Solve LY = PB and UX = Y using forward and backward substitution respectively
+    return matrix.LU_factor(A).solve(B)
+
+def _pick_method(A : Matrix) -> str :
+    # Cheapest solver the structure of A allows, the flags are cached on A so repeated solves don't rescan it
+    # Each flag is read once, since a matrix that has handed out rows recomputes them on every read
+    if not A.isSquare: return "lu"
+    lower, upper = A.bandwidth
+    permutation = A.isPermutation
+    if lower == upper == 0: return "diagonal"
+    if permutation: return "permutation"
+    if lower == 0: return "upper"
+    if upper == 0: return "lower"
+    if lower + upper + 1 <= _BANDED_FRACTION*A.dimensions[0]: return "banded"
+    # Cholesky takes square roots, so exact entries (frac, ...) would be mixed with floats, LU keeps them exact
+    if A.isSymmetric and all(A.vals[i][i] > 0 for i in range(A.dimensions[0])) and _real_entries(A): return "cholesky"
+    return "lu"
+
+def _real_entries(A : Matrix) -> bool :
+    return A.storage == "array" or all(type(val) in (int, float) for row in A.vals for val in row)
 
-    # LY = PB = B'
-    B = P@B
-    for k in range(e):
+# Direct solvers for structured matrices, all of them solve every column of B at once
+
+def diagonal_solve(A : Matrix, B : Matrix) -> Matrix :
+    diag = [A.vals[i][i] for i in range(A.dimensions[0])]
+    if any(val == 0 for val in diag): raise ValueError("The matrix is singular")
+    return Matrix([[val/d for val in row] for d, row in zip(diag, B.vals)], storage = B.storage)
+
+def permutation_solve(A : Matrix, B : Matrix) -> Matrix :
+    # Row i of A picks out x[col(i)], so x[col(i)] = b[i]
+    X = [None]*A.dimensions[0]
+    for i, row in enumerate(A.vals):
+        col = next(j for j, val in enumerate(row) if val != 0)
+        X[col] = list(B.vals[i])
+    return Matrix(X, storage = B.storage)
+
+@instrument.timed("substitution")
+def forward_substitution(L : Matrix, B : Matrix) -> Matrix :
+    # LX = B for lower triangular L
+    n = L.dimensions[0]
+    rows = [list(L.vals[i][:i]) for i in range(n)]
+    diag = [L.vals[i][i] for i in range(n)]
+    if any(val == 0 for val in diag): raise ValueError("The matrix is singular")
+    columns = []
+    for b in zip(*B.vals):
+        x = []
         for i in range(n):
-            Y[i,k] = B[i,k]
-            for j in range(i):
-                Y[i,k] -= L[i,j]*Y[j,k]
-
-    # UX = Y
-    for k in range(e):
-        for i in range(1, n+1):
-            X[-i,k] = Y[-i,k]
-            for j in range(1, i):
-                X[-i,k] -= U[-i,-j]*X[-j,k]
-            X[-i,k] /= U[-i,-i]
-    
-    return X
\ No newline at end of file
+            x.append((b[i] - sum(map(operator.mul, rows[i], x)))/diag[i])
+        columns.append(x)
+    return Matrix([list(row) for row in zip(*columns)], storage = B.storage)
+
+@instrument.timed("substitution")
+def back_substitution(U : Matrix, B : Matrix) -> Matrix :
+    # UX = B for upper triangular U, x is built back to front to line up with the reversed rows of U
+    n = U.dimensions[0]
+    rows = [list(U.vals[i][:i:-1]) for i in range(n)]
+    diag = [U.vals[i][i] for i in range(n)]
+    if any(val == 0 for val in diag): raise ValueError("The matrix is singular")
+    columns = []
+    for b in zip(*B.vals):
+        x = []
+        for i in range(n-1, -1, -1):
+            x.append((b[i] - sum(map(operator.mul, rows[i], x)))/diag[i])
+        x.reverse()
+        columns.append(x)
+    return Matrix([list(row) for row in zip(*columns)], storage = B.storage)
+
+def cholesky_solve(L : Matrix, B : Matrix) -> Matrix :
+    # A = L@L^T, solve LY = B then L^T X = Y
+    return back_substitution(L.transpose(), forward_substitution(L, B))
+
+# Banded systems
+
+'''
+Row-wise band storage, only the diagonals from -lower to +upper are kept, e.g. lower = 1, upper = 1
+
+[d0, u0,  0,  0]        bands = [[ 0, d0, u0],
+[l1, d1, u1,  0]   ->            [l1, d1, u1],
+[ 0, l2, d2, u2]                 [l2, d2, u2],
+[ 0,  0, l3, d3]                 [l3, d3,  0]]
+
+bands[i][k] is A[i][i - lower + k], entries falling outside the matrix are 0
+'''
+
+class BandedMatrix:
+    def __init__(self, n : int, lower : int, upper : int, bands : list[list]|None = None) :
+        if lower < 0 or upper < 0: raise ValueError(f"Bandwidths must be non-negative, got {lower} and {upper}")
+        width = lower + upper + 1
+        if bands is None: bands = [[0]*width for _ in range(n)]
+        if len(bands) != n or any(len(row) != width for row in bands): raise ValueError(f"Expected {n} bands of width {width}")
+        self.dimensions = (n, n)
+        self.isSquare = True
+        self.lower = lower
+        self.upper = upper
+        self.bands = bands
+
+    @classmethod
+    def from_matrix(cls, A : Matrix, lower : int|None = None, upper : int|None = None) -> "BandedMatrix" :
+        if not A.isSquare: raise ValueError("Banded storage is only supported for square matrices")
+        if lower is None or upper is None:
+            found = A.bandwidth
+            lower = found[0] if lower is None else lower
+            upper = found[1] if upper is None else upper
+        n = A.dimensions[0]
+        bands = []
+        for i, row in enumerate(A.vals):
+            start, end = i - lower, i + upper + 1
+            bands.append([0]*max(0, -start) + list(row[max(0, start) : min(n, end)]) + [0]*max(0, end - n))
+        return cls(n, lower, upper, bands)
+
+    @classmethod
+    def tridiagonal(cls, sub : list, diag : list, sup : list) -> "BandedMatrix" :
+        n = len(diag)
+        if len(sub) != n-1 or len(sup) != n-1: raise ValueError(f"Expected off-diagonals of length {n-1}, got {len(sub)} and {len(sup)}")
+        return cls(n, 1, 1, [[sub[i-1] if i > 0 else 0, diag[i], sup[i] if i < n-1 else 0] for i in range(n)])
+
+    def to_matrix(self, storage : str|None = None) -> Matrix :
+        n = self.dimensions[0]
+        return Matrix([[self[i, j] for j in range(n)] for i in range(n)], storage = storage)
+
+    def __getitem__(self, idx):
+        i, j = idx
+        k = j - i + self.lower
+        if 0 <= k < len(self.bands[i]): return self.bands[i][k]
+        return 0
+
+    def __setitem__(self, idx, val):
+        i, j = idx
+        k = j - i + self.lower
+        if not 0 <= k < len(self.bands[i]): raise IndexError(f"Entry ({i}, {j}) is outside the band")
+        self.bands[i][k] = val
+
+def thomas(sub : list, diag : list, sup : list, rhs : list) -> list :
+    # Tridiagonal solve without pivoting, O(n), stable for diagonally dominant systems
+    n = len(diag)
+    c = [0]*n
+    d = [0]*n
+    if diag[0] == 0: raise ValueError("Zero pivot in Thomas algorithm, the system needs pivoting")
+    c[0] = sup[0]/diag[0] if n > 1 else 0
+    d[0] = rhs[0]/diag[0]
+    for i in range(1, n):
+        denom = diag[i] - sub[i-1]*c[i-1]
+        if denom == 0: raise ValueError("Zero pivot in Thomas algorithm, the system needs pivoting")
+        if i < n-1: c[i] = sup[i]/denom
+        d[i] = (rhs[i] - sub[i-1]*d[i-1])/denom
+    for i in range(n-2, -1, -1):
+        d[i] -= c[i]*d[i+1]
+    return d
+
+def _band_entry(row : list, offset : int) :
+    # Entries past the end of a stored row lie outside the band and are 0
+    return row[offset] if offset < len(row) else 0
+
+@instrument.timed("banded_solve")
+def banded_solve(A : BandedMatrix, B : Matrix) -> Matrix :
+    # O(n * lower * (lower + upper)) time and O(n * (2*lower + upper)) memory
+    n = A.dimensions[0]
+    d, e = B.dimensions
+    if n != d: raise ValueError(f"Dimensions of A and B are incompatible, got ({n}x{n}) and ({d}x{e})")
+    lower, upper = A.lower, A.upper
+
+    if lower == 1 and upper == 1:
+        sub = [A.bands[i][0] for i in range(1, n)]
+        diag = [A.bands[i][1] for i in range(n)]
+        sup = [A.bands[i][2] for i in range(n-1)]
+        # Thomas doesn't pivot, so it is only used where that is stable, otherwise the pivoted LU below
+        dominant = all(abs(diag[i]) >= (abs(sub[i-1]) if i > 0 else 0) + (abs(sup[i]) if i < n-1 else 0) for i in range(n))
+        if dominant:
+            try:
+                columns = [thomas(sub, diag, sup, list(col)) for col in zip(*B.vals)]
+                return Matrix([list(row) for row in zip(*columns)], storage = B.storage)
+            except ValueError:
+                pass
+
+    # LU with partial pivoting, working row i holds columns start[i] ... start[i] + len(rows[i]) - 1
+    # Row swaps can move a row up by at most lower, so the upper bandwidth of U grows to at most lower + upper
+    rows = [band[:] for band in A.bands]
+    start = [i - lower for i in range(n)]
+    rhs = [list(row) for row in B.vals]
+    for k in range(n):
+        last = min(n-1, k + lower)
+        pivot = max(range(k, last+1), key = lambda r: abs(_band_entry(rows[r], k - start[r])))
+        if _band_entry(rows[pivot], k - start[pivot]) == 0: raise ValueError("The matrix is singular")
+        if pivot != k:
+            rows[k], rows[pivot] = rows[pivot], rows[k]
+            start[k], start[pivot] = start[pivot], start[k]
+            rhs[k], rhs[pivot] = rhs[pivot], rhs[k]
+
+        row_k = rows[k]
+        offset_k = k - start[k]
+        pivot_val = row_k[offset_k]
+        tail = row_k[offset_k+1:]
+        end_k = start[k] + len(row_k)
+        for j in range(k+1, last+1):
+            row_j = rows[j]
+            offset_j = k - start[j]
+            if _band_entry(row_j, offset_j) == 0: continue
+            factor = row_j[offset_j]/pivot_val
+            # Make room for fill-in from the pivot row
+            if start[j] + len(row_j) < end_k: row_j += [0]*(end_k - start[j] - len(row_j))
+            row_j[offset_j+1 : offset_j+1+len(tail)] = [a - factor*b for a, b in zip(row_j[offset_j+1:], tail)]
+            row_j[offset_j] = 0
+            rhs[j] = [a - factor*b for a, b in zip(rhs[j], rhs[k])]
+
+    # Back substitution through the upper triangle
+    X = [None]*n
+    for k in range(n-1, -1, -1):
+        row_k = rows[k]
+        offset_k = k - start[k]
+        acc = rhs[k]
+        for c in range(offset_k+1, len(row_k)):
+            col = start[k] + c
+            if col >= n or row_k[c] == 0: continue
+            u = row_k[c]
+            acc = [a - u*x for a, x in zip(acc, X[col])]
+        X[k] = [a/row_k[offset_k] for a in acc]
+    return Matrix(X, storage = B.storage)
+
+# Iterative solvers for large (sparse) systems
+# A can be a SparseMatrix or a Matrix, b a list or an n x 1 Matrix, and the solution is returned as a list
+# Each solver also returns a dict reporting convergence:
+#   converged  - whether the residual norm reached tolerance * |b|
+#   iterations - number of iterations (inner iterations for gmres)
+#   residual   - final residual norm |b - Ax|
+#   history    - residual norm after every iteration
+# preconditioner is a function z = M^-1 r, e.g. from jacobi_preconditioner(A)
+
+def _as_sparse(A) -> SparseMatrix :
+    if isinstance(A, SparseMatrix): return A
+    if isinstance(A, Matrix): return SparseMatrix.from_dense(A)
+    raise TypeError(f"Expected a Matrix or SparseMatrix, got {type(A)}")
+
+def _as_vector(b) -> list :
+    if isinstance(b, Matrix):
+        if b.dimensions[1] != 1: raise ValueError(f"Expected a column vector, got a {b.dimensions[0]}x{b.dimensions[1]} matrix")
+        return [row[0] for row in b.vals]
+    return list(b)
+
+def _dot(u : list, v : list) :
+    return sum(map(operator.mul, u, v))
+
+def _norm(v : list) -> float :
+    return math.sqrt(_dot(v, v))
+
+def _axpy(a, x : list, y : list) -> list :
+    # y + a*x
+    return list(map(operator.add, y, map(operator.mul, repeat(a), x)))
+
+def _setup(A, b, x0, tolerance : float) :
+    A = _as_sparse(A)
+    if not A.isSquare: raise ValueError(f"Iterative solvers need a square matrix, got {A.dimensions[0]}x{A.dimensions[1]}")
+    b = _as_vector(b)
+    if len(b) != A.dimensions[0]: raise ValueError(f"Dimensions of A and b are incompatible, got ({A.dimensions[0]}x{A.dimensions[1]}) and {len(b)}")
+    x = [0.0]*len(b) if x0 is None else _as_vector(x0)
+    b_norm = _norm(b)
+    return A, b, x, tolerance * (b_norm if b_norm > 0 else 1)
+
+def _info(converged : bool, history : list) -> dict :
+    return {"converged" : converged, "iterations" : len(history) - 1, "residual" : history[-1], "history" : history}
+
+def jacobi_preconditioner(A) -> callable :
+    diag = _as_sparse(A).diagonal()
+    if any(d == 0 for d in diag): raise ValueError("Jacobi preconditioner needs a non-zero diagonal")
+    inv = [1/d for d in diag]
+    def precondition(r : list) -> list :
+        return list(map(operator.mul, inv, r))
+    return precondition
+
+def conjugate_gradient(A, b, x0 = None, tolerance : float = 1e-10, max_iter : int|None = None, preconditioner : callable = None) -> tuple[list, dict] :
+    # For symmetric positive definite A
+    A, b, x, tol = _setup(A, b, x0, tolerance)
+    max_iter = 10*len(b) if max_iter is None else max_iter
+
+    r = list(map(operator.sub, b, A.matvec(x)))
+    z = preconditioner(r) if preconditioner else r
+    p = z
+    rz = _dot(r, z)
+    history = [_norm(r)]
+    for _ in range(max_iter):
+        if history[-1] <= tol: break
+        Ap = A.matvec(p)
+        pAp = _dot(p, Ap)
+        if pAp == 0: break
+        alpha = rz/pAp
+        x = _axpy(alpha, p, x)
+        r = _axpy(-alpha, Ap, r)
+        history.append(_norm(r))
+        z = preconditioner(r) if preconditioner else r
+        rz_new = _dot(r, z)
+        p = _axpy(rz_new/rz, p, z)
+        rz = rz_new
+    return x, _info(history[-1] <= tol, history)
+
+def gmres(A, b, x0 = None, tolerance : float = 1e-10, restart : int = 30, max_iter : int|None = None, preconditioner : callable = None) -> tuple[list, dict] :
+    # Restarted GMRES(restart) with right preconditioning, for general non-singular A
+    A, b, x, tol = _setup(A, b, x0, tolerance)
+    n = len(b)
+    max_iter = 10*n if max_iter is None else max_iter
+    restart = max(1, min(restart, n))
+
+    r = list(map(operator.sub, b, A.matvec(x)))
+    history = [_norm(r)]
+    while history[-1] > tol and len(history) <= max_iter:
+        beta = history[-1]
+        V = [[val/beta for val in r]]
+        Z = []
+        H = []              # columns of the (rotated, so upper triangular) Hessenberg matrix
+        cs, sn = [], []     # Givens rotations
+        g = [beta]
+        for j in range(restart):
+            z = preconditioner(V[j]) if preconditioner else V[j]
+            Z.append(z)
+            # Arnoldi step, modified Gram-Schmidt
+            w = A.matvec(z)
+            h = []
+            for v in V:
+                hij = _dot(w, v)
+                w = _axpy(-hij, v, w)
+                h.append(hij)
+            h_next = _norm(w)
+            h.append(h_next)
+            # Apply the previous rotations to the new column, then eliminate its subdiagonal entry
+            for i in range(j):
+                h[i], h[i+1] = cs[i]*h[i] + sn[i]*h[i+1], -sn[i]*h[i] + cs[i]*h[i+1]
+            denom = math.hypot(h[j], h[j+1])
+            if denom == 0: break
+            cs.append(h[j]/denom)
+            sn.append(h[j+1]/denom)
+            h[j], h[j+1] = denom, 0.0
+            g.append(-sn[j]*g[j])
+            g[j] = cs[j]*g[j]
+            H.append(h)
+            history.append(abs(g[j+1]))
+            if history[-1] <= tol or h_next == 0 or len(history) > max_iter: break
+            V.append([val/h_next for val in w])
+
+        # Solve the k x k triangular system H y = g and update x with the preconditioned basis
+        k = len(H)
+        if k == 0: break
+        y = [0.0]*k
+        for i in range(k-1, -1, -1):
+            y[i] = (g[i] - sum(H[l][i]*y[l] for l in range(i+1, k)))/H[i][i]
+        for i in range(k):
+            x = _axpy(y[i], Z[i], x)
+        r = list(map(operator.sub, b, A.matvec(x)))
+        # Replace the estimate by the true residual, which rounding can make differ slightly
+        history[-1] = _norm(r)
+    return x, _info(history[-1] <= tol, history)
+
+def jacobi(A, b, x0 = None, tolerance : float = 1e-10, max_iter : int = 10000) -> tuple[list, dict] :
+    A, b, x, tol = _setup(A, b, x0, tolerance)
+    inv = [1/d if d != 0 else None for d in A.diagonal()]
+    if None in inv: raise ValueError("Jacobi iteration needs a non-zero diagonal")
+
+    r = list(map(operator.sub, b, A.matvec(x)))
+    history = [_norm(r)]
+    for _ in range(max_iter):
+        if history[-1] <= tol: break
+        # x = x + D^-1 (b - Ax)
+        x = list(map(operator.add, x, map(operator.mul, inv, r)))
+        r = list(map(operator.sub, b, A.matvec(x)))
+        history.append(_norm(r))
+    return x, _info(history[-1] <= tol, history)
+
+def sor(A, b, omega : float = 1.5, x0 = None, tolerance : float = 1e-10, max_iter : int = 10000) -> tuple[list, dict] :
+    # Successive over-relaxation, omega = 1 is Gauss-Seidel
+    if not 0 < omega < 2: raise ValueError(f"SOR only converges for 0 < omega < 2, got {omega}")
+    A, b, x, tol = _setup(A, b, x0, tolerance)
+    diag = A.diagonal()
+    if any(d == 0 for d in diag): raise ValueError("SOR iteration needs a non-zero diagonal")
+    rows = [A.row(i) for i in range(len(b))]
+    get = x.__getitem__
+
+    r = list(map(operator.sub, b, A.matvec(x)))
+    history = [_norm(r)]
+    for _ in range(max_iter):
+        if history[-1] <= tol: break
+        # Sweep through the rows in place, each update uses the newest values of x
+        for i, (cols, vals) in enumerate(rows):
+            x[i] += omega*(b[i] - sum(map(operator.mul, vals, map(get, cols))))/diag[i]
+        r = list(map(operator.sub, b, A.matvec(x)))
+        history.append(_norm(r))
+    return x, _info(history[-1] <= tol, history)
+
+def gauss_seidel(A, b, x0 = None, tolerance : float = 1e-10, max_iter : int = 10000) -> tuple[list, dict] :
+    return sor(A, b, 1.0, x0, tolerance, max_iter)
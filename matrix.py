@@ -11,29 +11,197 @@
 [x] = [A]^-1[B]
 '''
 
+from array import array
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from math import gcd, sqrt
+import operator
+import os
+from fraction import frac
+import instrument
+
+# Matrices can store their values in one of two ways:
+#   "list"  - a list of python lists, which can hold any element type (int, float, frac, ...)
+#   "array" - a single contiguous array('d') buffer of floats, with rows handed out as views into it
+# New matrices use the default storage unless one is given explicitly
+_storage_types = ("list", "array")
+_default_storage = "list"
+
+def set_default_storage(storage : str) :
+    global _default_storage
+    if storage not in _storage_types: raise ValueError(f"Unknown storage {storage}, expected one of {_storage_types}")
+    _default_storage = storage
+
+class _RowView:
+    # A row of an array backed matrix, reads and writes go straight to the matrix buffer
+    __slots__ = ("_buf", "_start", "_len")
+
+    def __init__(self, buf : array, start : int, length : int):
+        self._buf = buf
+        self._start = start
+        self._len = length
+
+    def _index(self, idx : int) -> int :
+        if idx < 0: idx += self._len
+        if not 0 <= idx < self._len: raise IndexError("Matrix row index out of range")
+        return self._start + idx
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice): return self.toarray()[idx]
+        return self._buf[self._index(idx)]
+
+    def __setitem__(self, idx, val):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._len)
+            positions = range(start, stop, step)
+            val = array("d", val)
+            # The row can't change length, it would shift every later row in the shared buffer
+            if len(val) != len(positions): raise ValueError(f"Cannot assign {len(val)} values to a slice of length {len(positions)}")
+            if step == 1:
+                self._buf[self._start+start : self._start+max(start, stop)] = val
+            else:
+                for pos, v in zip(positions, val): self._buf[self._start + pos] = v
+        else:
+            self._buf[self._index(idx)] = val
+
+    def __iter__(self):
+        return iter(self.toarray())
+
+    def __eq__(self, other):
+        try: return len(other) == self._len and all(a == b for a, b in zip(self, other))
+        except TypeError: return NotImplemented
+
+    def __add__(self, other):
+        return self.toarray() + array("d", other)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def toarray(self) -> array :
+        return self._buf[self._start : self._start + self._len]
+
+    def tolist(self) -> list :
+        return self.toarray().tolist()
+
+class _RowTable:
+    # Row access for array backed matrices, rows are offsets into the shared buffer
+    # Assigning a row of the same matrix rebinds the offset (like a python list would), so swaps never copy data
+    __slots__ = ("buf", "offsets", "width")
+
+    def __init__(self, buf : array, n : int, m : int):
+        self.buf = buf
+        self.offsets = list(range(0, n*m, m))
+        self.width = m
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice): return [_RowView(self.buf, off, self.width) for off in self.offsets[idx]]
+        return _RowView(self.buf, self.offsets[idx], self.width)
+
+    def __setitem__(self, idx, row):
+        if isinstance(row, _RowView) and row._buf is self.buf:
+            self.offsets[idx] = row._start
+            return
+        if len(row) != self.width: raise ValueError(f"Matrix row length mismatch, expected {self.width}, got {len(row)}")
+        start = self.offsets[idx]
+        self.buf[start : start+self.width] = array("d", row)
+
+    def __iter__(self):
+        for off in self.offsets:
+            yield _RowView(self.buf, off, self.width)
+
+    def flat(self) -> array :
+        # The values in row major order, without copying when the rows have not been rearranged
+        m = self.width
+        if all(off == i*m for i, off in enumerate(self.offsets)) and len(self.buf) == m*len(self.offsets): return self.buf
+        out = array("d")
+        for off in self.offsets: out += self.buf[off : off+m]
+        return out
+
+class _ColumnView:
+    # A column of a matrix (any storage), reads and writes go straight to the matrix
+    __slots__ = ("_vals", "_col")
+
+    def __init__(self, vals, col : int):
+        self._vals = vals
+        self._col = col
+
+    def __len__(self):
+        return len(self._vals)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice): return [row[self._col] for row in self._vals[idx]]
+        return self._vals[idx][self._col]
+
+    def __setitem__(self, idx, val):
+        self._vals[idx][self._col] = val
+
+    def __iter__(self):
+        for row in self._vals:
+            yield row[self._col]
+
+    def __repr__(self):
+        return repr(list(self))
+
 class Matrix:
-    def __init__(self, *rows) :
-        if len(rows) == 1 and isinstance(rows[0], list) and all(isinstance(row, list) for row in rows[0]):
+    def __init__(self, *rows, storage : str|None = None) :
+        if len(rows) == 1 and isinstance(rows[0], list) and all(isinstance(row, (list, array, _RowView)) for row in rows[0]):
             rows = tuple(rows[0])
+        storage = _default_storage if storage is None else storage
+        if storage not in _storage_types: raise ValueError(f"Unknown storage {storage}, expected one of {_storage_types}")
         n = len(rows)
         m = len(rows[0])
         for row in rows:
             if len(row) != m: raise ValueError("Matrix dimensions not consistent")
         self.dimensions = (n, m)
-        self.vals = [*rows]
+        self.storage = storage
+        if storage == "array":
+            buf = array("d")
+            for row in rows:
+                buf += row.toarray() if isinstance(row, _RowView) else array("d", row)
+            self.vals = _RowTable(buf, n, m)
+        else:
+            self.vals = [*rows]
         self.isSquare = (self.dimensions[0] == self.dimensions[1])
+        self._structure = {}
+        self._views = False
+
+    @classmethod
+    def _from_buffer(cls, buf : array, n : int, m : int) -> "Matrix" :
+        # Wraps a row major array('d') of length n*m without copying it
+        out = cls.__new__(cls)
+        out.dimensions = (n, m)
+        out.storage = "array"
+        out.vals = _RowTable(buf, n, m)
+        out.isSquare = (n == m)
+        out._structure = {}
+        out._views = False
+        return out
+
+    def _flat_pair(self, other : "Matrix") :
+        # Row major buffers of both matrices if both are array backed, else None
+        if self.storage == "array" and other.storage == "array": return self.vals.flat(), other.vals.flat()
+        return None
     
     def __getitem__(self, idx):
         if isinstance(idx, tuple):
             if len(idx) != 2: raise ValueError(f"Expected 2 positional arguments, got {len(idx)}")
             return self.vals[idx[0]][idx[1]]
+        # The caller gets a writable row, so the cached structure can no longer be trusted
+        self._handed_out()
         return self.vals[idx]
     
     def __setitem__(self, idx, val):
+        self._structure.clear()
         if isinstance(idx, tuple):
             if len(idx) != 2: raise ValueError(f"Expected 2 positional arguments, got {len(idx)}")
             self.vals[idx[0]][idx[1]] = val
-        elif isinstance(val, list):
+        elif isinstance(val, (list, array, _RowView)):
             if len(val) != self.dimensions[1]: raise ValueError(f"Matrix row length mismatch, expected {self.dimensions[1]}, got {len(val)}")
             self.vals[idx] = val
     
@@ -49,59 +217,133 @@ class Matrix:
         return matrix_representation
     
     def __iter__(self):
+        self._handed_out()
         for row in self.vals:
             yield row
     
     def __eq__(self, other) :
-        return type(other) == Matrix and self.dimensions == other.dimensions and all([all([self.vals[i][j] == other.vals[i][j] for j in range(self.dimensions[1])] for i in range(self.dimensions[0]))])
+        if type(other) != Matrix or self.dimensions != other.dimensions: return False
+        flat = self._flat_pair(other)
+        if flat is not None: return flat[0] == flat[1]
+        return all(all(a == b for a, b in zip(self.vals[i], other.vals[i])) for i in range(self.dimensions[0]))
     
     def __add__(self, other) :
         if not isinstance(other, Matrix): raise TypeError(f"Cannot add matrix with {type(other)}")
         if self.dimensions != other.dimensions: raise TypeError(f"Cannot add matrices with dimensions {self.dimensions} & {other.dimensions}")
         n,m = self.dimensions
-        return Matrix([[self.vals[i][j] + other.vals[i][j] for j in range(m)] for i in range(n)])
+        flat = self._flat_pair(other)
+        if flat is not None: return Matrix._from_buffer(array("d", map(operator.add, *flat)), n, m)
+        return Matrix([[self.vals[i][j] + other.vals[i][j] for j in range(m)] for i in range(n)], storage = self.storage)
     
     def __sub__(self, other) :
         if not isinstance(other, Matrix): raise TypeError(f"Cannot subtract matrix from {type(other)}")
         if self.dimensions != other.dimensions: raise TypeError(f"Cannot subtract matrices with dimensions {self.dimensions} & {other.dimensions})")
         n,m = self.dimensions
-        return Matrix([[self.vals[i][j] - other.vals[i][j] for j in range(m)] for i in range(n)])
+        flat = self._flat_pair(other)
+        if flat is not None: return Matrix._from_buffer(array("d", map(operator.sub, *flat)), n, m)
+        return Matrix([[self.vals[i][j] - other.vals[i][j] for j in range(m)] for i in range(n)], storage = self.storage)
     
     def __mul__(self, other) :
         if isinstance(other, (int, float)):
             n,m = self.dimensions
-            return Matrix([[self.vals[i][j]*other for j in range(m)] for i in range(n)])
+            if self.storage == "array": return Matrix._from_buffer(array("d", map(operator.mul, self.vals.flat(), repeat(other))), n, m)
+            return Matrix([[self.vals[i][j]*other for j in range(m)] for i in range(n)], storage = self.storage)
         if isinstance(other, Matrix):
             n,m = self.dimensions
             o,p = other.dimensions
             if (n,m) != (o,p): raise TypeError("Cannot element-wise multiply matrices of different sizes (Use @ for matrix multiplication)")
-            return Matrix([[self.vals[i][j] * other.vals[i][j] for j in range(m)] for i in range(n)])
+            flat = self._flat_pair(other)
+            if flat is not None: return Matrix._from_buffer(array("d", map(operator.mul, *flat)), n, m)
+            return Matrix([[self.vals[i][j] * other.vals[i][j] for j in range(m)] for i in range(n)], storage = self.storage)
     
     def __rmul__(self, other) :
         if isinstance(other, (int, float)):
             n,m = self.dimensions
-            return Matrix([[self.vals[i][j] * other for j in range(m)] for i in range(n)])
+            if self.storage == "array": return Matrix._from_buffer(array("d", map(operator.mul, self.vals.flat(), repeat(other))), n, m)
+            return Matrix([[self.vals[i][j] * other for j in range(m)] for i in range(n)], storage = self.storage)
     
     def __matmul__(self, other) :
         if not isinstance(other, Matrix) : raise TypeError(f"Cannot do matrix multiplication with {type(other)}")
         return multiply(self, other)
     
+    # Structural flags are computed on first use and cached until the matrix is modified through __setitem__,
+    # swap_rows, swap_columns or fill. Once a writable row or column has been handed out (A[i], row, column,
+    # iteration) later writes through it can't be seen, so from then on the flags are recomputed on every use
+    # (writes straight into .vals are not tracked)
+
+    def _handed_out(self):
+        self._structure.clear()
+        self._views = True
+
+    def _cache(self) -> dict :
+        if self._views: self._structure.clear()
+        return self._structure
+
+    def _band_structure(self) -> dict :
+        if "bandwidth" not in self._cache():
+            # One pass for the bandwidth, and for whether every row is a single 1 (a permutation matrix if the columns are distinct)
+            lower = upper = 0
+            permutation = self.isSquare
+            ones = set()
+            for i, row in enumerate(self.vals):
+                nonzero = [j for j, val in enumerate(row) if val != 0]
+                if nonzero:
+                    lower = max(lower, i - nonzero[0])
+                    upper = max(upper, nonzero[-1] - i)
+                if permutation:
+                    permutation = len(nonzero) == 1 and row[nonzero[0]] == 1 and nonzero[0] not in ones
+                    if permutation: ones.add(nonzero[0])
+            self._structure["bandwidth"] = (lower, upper)
+            self._structure["permutation"] = permutation
+        return self._structure
+
+    @property
+    def bandwidth(self) -> tuple[int, int] :
+        # (lower, upper) - the furthest non-zero below and above the diagonal
+        return self._band_structure()["bandwidth"]
+
     @property
     def isUpper(self):
-        return self.isSquare and all([all([self.vals[i][j] == 0 for j in range(0, i)]) for  i in range(1, self.dimensions[0])])
+        return self.isSquare and self.bandwidth[0] == 0
 
     @property
     def isLower(self):
-        return self.isSquare and all([all([self.vals[i][j] == 0 for j in range(i+1, self.dimensions[1])]) for i in range(0, self.dimensions[0]-1)])
+        return self.isSquare and self.bandwidth[1] == 0
     
     @property
     def isDiagonal(self):
-        return self.isUpper and self.isLower
+        return self.isSquare and self.bandwidth == (0, 0)
+
+    @property
+    def isPermutation(self):
+        return self._band_structure()["permutation"]
+
+    @property
+    def isSymmetric(self):
+        if "symmetric" not in self._cache():
+            vals = self.vals
+            self._structure["symmetric"] = self.isSquare and all(vals[i][j] == vals[j][i] for i in range(self.dimensions[0]) for j in range(i+1, self.dimensions[0]))
+        return self._structure["symmetric"]
+
+    def row(self, idx : int) :
+        # The row itself, not a copy (a list, or a view into the buffer for array storage)
+        self._handed_out()
+        return self.vals[idx]
+
+    def column(self, idx : int) -> _ColumnView :
+        self._handed_out()
+        return _ColumnView(self.vals, idx)
 
     def copy(self):
-        return Matrix([row[:] for row in self.vals])
+        if self.storage == "array": return Matrix._from_buffer(array("d", self.vals.flat()), *self.dimensions)
+        return Matrix([row[:] for row in self.vals], storage = self.storage)
 
     def fill(self, val):
+        self._structure.clear()
+        if self.storage == "array":
+            n, m = self.dimensions
+            self.vals = _RowTable(array("d", repeat(val, n*m)), n, m)
+            return
         for i in range(self.dimensions[0]):
             for j in range(self.dimensions[1]):
                 self.vals[i][j] = val
@@ -114,78 +356,304 @@ class Matrix:
         return tr
     
     def minor(self, row, col):
-        return Matrix(*[self.vals[i][:col-1]+self.vals[i][col:] for i in range(self.dimensions[0]) if i!=(row-1)])
+        return Matrix(*[self.vals[i][:col-1]+self.vals[i][col:] for i in range(self.dimensions[0]) if i!=(row-1)], storage = self.storage)
 
     def transpose(self):
-        return Matrix(*[[self.vals[i][j] for i in range(self.dimensions[0])] for j in range(self.dimensions[1])])
+        if self.storage == "array":
+            n, m = self.dimensions
+            flat = self.vals.flat()
+            out = array("d")
+            for j in range(m): out += flat[j::m]
+            return Matrix._from_buffer(out, m, n)
+        return Matrix(*[[self.vals[i][j] for i in range(self.dimensions[0])] for j in range(self.dimensions[1])], storage = self.storage)
     
     def swap_rows(self, row1, row2):
-        temp = self.vals[row1-1]
-        self.vals[row1-1] = self.vals[row2-1]
-        self.vals[row2-1] = temp
-        self.__init__()
+        self._structure.clear()
+        self.vals[row1-1], self.vals[row2-1] = self.vals[row2-1], self.vals[row1-1]
 
     def swap_columns(self, column1, column2):
+        self._structure.clear()
         temp = [self.vals[i][column1 - 1] for i in range(self.dimensions[0])]
         for i in range(self.dimensions[0]):
             self.vals[i][column1 - 1] = self.vals[i][column2 - 1]
             self.vals[i][column2 - 1] = temp[i]
-        self.__init__()
 
-def zeroes(n : int, m : int) -> Matrix :
-    return Matrix(*[[0 for _ in range(m)] for _ in range(n)])
+def zeroes(n : int, m : int, storage : str|None = None) -> Matrix :
+    if (_default_storage if storage is None else storage) == "array": return Matrix._from_buffer(array("d", bytes(8*n*m)), n, m)
+    return Matrix(*[[0 for _ in range(m)] for _ in range(n)], storage = storage)
+
+def identity(n : int, storage : str|None = None) -> Matrix :
+    out = zeroes(n, n, storage)
+    for i in range(n): out.vals[i][i] = 1
+    return out
+
+# Matrix multiplication
+# B is packed into columns once so that every entry of the product is a single C level dot product,
+# the columns are then swept in tiles of block_size so a tile stays hot while all rows of A pass over it
+# Large products are split into row blocks and spread over worker processes
 
-def identity(n : int) -> Matrix :
-    return Matrix(*[[1 if i==j else 0 for j in range(n)] for i in range(n)])
+_SMALL_PRODUCT = 48**3      # n*m*o below which tiling is skipped
+_PARALLEL_PRODUCT = 256**3  # n*m*o above which worker processes are used (when more than one cpu is available)
+_BLOCK_SIZE = 64
 
-def multiply(A : Matrix, B : Matrix) -> Matrix :
+def _packed_rows(M : Matrix) -> list :
+    if M.storage == "array": return [row.toarray() for row in M.vals]
+    return M.vals
+
+def _packed_columns(M : Matrix) -> list :
+    if M.storage == "array":
+        flat = M.vals.flat()
+        m = M.dimensions[1]
+        return [flat[j::m] for j in range(m)]
+    return list(zip(*M.vals))
+
+def _multiply_rows(rows : list, cols : list, block_size : int) -> list[list] :
+    mul = operator.mul
+    if block_size >= len(cols): return [[sum(map(mul, row, col)) for col in cols] for row in rows]
+    out = [[] for _ in rows]
+    for start in range(0, len(cols), block_size):
+        tile = cols[start : start+block_size]
+        for i, row in enumerate(rows):
+            out[i] += [sum(map(mul, row, col)) for col in tile]
+    return out
+
+def _multiply_parallel(rows : list, cols : list, block_size : int, workers : int) -> list[list] :
+    from concurrent.futures import ProcessPoolExecutor
+    chunk = -(-len(rows) // workers)
+    chunks = [rows[i : i+chunk] for i in range(0, len(rows), chunk)]
+    with ProcessPoolExecutor(workers) as executor:
+        parts = executor.map(_multiply_rows, chunks, repeat(cols), repeat(block_size))
+        return [row for part in parts for row in part]
+
+def multiply(A : Matrix, B : Matrix, workers : int|None = None, block_size : int|None = None) -> Matrix :
     n = A.dimensions[0]
     m = B.dimensions[1]
     if A.dimensions[1] != B.dimensions[0]:
         raise TypeError(f"Cannot multiply matrices with dimensions {n}x{A.dimensions[1]} & {B.dimensions[0]}x{m}  (Use * for element-wise multiplication")
     o = A.dimensions[1]
 
-    C = zeroes(n, m)
-    for i in range(n):
-        for j in range(m):
-            for k in range(o):
-                C.vals[i][j] += A.vals[i][k] * B.vals[k][j]
-    return C
+    work = n*m*o
+    if block_size is None: block_size = m if work < _SMALL_PRODUCT else _BLOCK_SIZE
+    if workers is None: workers = min(os.cpu_count() or 1, n) if work >= _PARALLEL_PRODUCT else 1
+
+    rows = _packed_rows(A)
+    cols = _packed_columns(B)
+    out = None
+    if workers > 1:
+        try:
+            out = _multiply_parallel(rows, cols, block_size, workers)
+        except (OSError, BrokenProcessPool):
+            # No usable process pool on this system, fall back to the serial kernel
+            out = None
+    if out is None: out = _multiply_rows(rows, cols, block_size)
+    return Matrix(out, storage = A.storage)
+
+# LU factorization, PA = LU with partial pivoting
+
+class LUFactorization:
+    # Factors the matrix once, after which any number of right hand sides can be solved in O(n^2) each
+    # P is kept as a permutation vector: row i of PA is row perm[i] of A
+
+    @instrument.timed("lu_factor")
+    def __init__(self, matrix : Matrix):
+        if(matrix.dimensions[0] != matrix.dimensions[1]): raise TypeError("Cannot decompose non-square matrices into LU form")
+        size = matrix.dimensions[0]
+        self.size = size
+        self.storage = matrix.storage
+
+        # Find L & U such that PA = L@U, and L has all diagonal elements = 1
+
+        # Initialize L as identity
+        # For each column:
+            # Pick the row with the largest magnitude in the column as pivot and swap it to the top
+            # Find multiplier to be put in L to make element of U in that row = 0
+            # Find the corresponding row of U by multiplying with element of L and subtracting from A
+            # Uk,j = Ak,j - sum(0, k-1)Lk,s Us,j, j>=k
+            # Li,k = (Ai,k - sum(0, k-1)Li,s Us,k)/Uk,k, i>K
+
+        perm = list(range(size))
+        swaps = 0
+        L = [[1 if i == j else 0 for j in range(size)] for i in range(size)]
+        U = [list(row) for row in matrix.vals]
+
+        for i in range(size):
+            pivot = max(range(i,size), key = lambda r: abs(U[r][i]))
+            if U[pivot][i] == 0: raise ValueError("The matrix is singular and thus cannot be decomposed")
+
+            # swap rows to put pivot on the top row
+            if pivot != i:
+                U[i], U[pivot] = U[pivot], U[i]
+                perm[i], perm[pivot] = perm[pivot], perm[i]
+                L[i][:i], L[pivot][:i] = L[pivot][:i], L[i][:i]
+                swaps += 1
+
+            # Eliminate terms from U
+            row_i = U[i]
+            tail = row_i[i+1:]
+            for j in range(i+1, size):
+                row_j = U[j]
+                if row_j[i] == 0: continue
+                factor = row_j[i]/row_i[i]
+                L[j][i] = factor
+                row_j[i+1:] = [a - factor*b for a, b in zip(row_j[i+1:], tail)]
+                row_j[i] = 0
+
+        self.perm = perm
+        self.swaps = swaps
+        self._L = L
+        self._U = U
+        # Strictly lower rows of L, and strictly upper rows of U reversed, for the substitution dot products
+        self._lower = [L[i][:i] for i in range(size)]
+        self._upper = [U[i][:i:-1] for i in range(size)]
+        self._diag = [U[i][i] for i in range(size)]
+
+    @property
+    def P(self) -> Matrix :
+        P = zeroes(self.size, self.size, self.storage)
+        for i, p in enumerate(self.perm): P.vals[i][p] = 1
+        return P
+
+    @property
+    def L(self) -> Matrix :
+        return Matrix([row[:] for row in self._L], storage = self.storage)
+
+    @property
+    def U(self) -> Matrix :
+        return Matrix([row[:] for row in self._U], storage = self.storage)
+
+    @instrument.timed("lu_substitution")
+    def _solve_column(self, b : list) -> list :
+        mul = operator.mul
+        # LY = PB, forward substitution
+        y = []
+        for i in range(self.size):
+            y.append(b[self.perm[i]] - sum(map(mul, self._lower[i], y)))
+        # UX = Y, backward substitution, x is built back to front so it lines up with the reversed rows of U
+        x = []
+        for i in range(self.size-1, -1, -1):
+            x.append((y[i] - sum(map(mul, self._upper[i], x)))/self._diag[i])
+        x.reverse()
+        return x
+
+    def solve_vector(self, b : list) -> list :
+        # Solves Ax = b for a single right hand side given as a list, without wrapping it in a Matrix
+        if len(b) != self.size: raise ValueError(f"Expected a vector of length {self.size}, got {len(b)}")
+        return self._solve_column(b)
+
+    def solve(self, B : Matrix) -> Matrix :
+        # Solves AX = B for every column of B at once
+        d, e = B.dimensions
+        if d != self.size: raise ValueError(f"Dimensions of A and B are incompatible, got ({self.size}x{self.size}) and ({d}x{e})")
+        columns = [self._solve_column(col) for col in _packed_columns(B)]
+        return Matrix([list(row) for row in zip(*columns)], storage = B.storage)
+
+    def det(self):
+        out = -1 if self.swaps % 2 else 1
+        for val in self._diag: out = out * val
+        return out
+
+    def inverse(self) -> Matrix :
+        return self.solve(identity(self.size, self.storage))
+
+def LU_factor(matrix : Matrix) -> LUFactorization :
+    return LUFactorization(matrix)
 
 def LU_decompose(matrix : Matrix) -> tuple[Matrix, Matrix, Matrix] :
-    if(matrix.dimensions[0] != matrix.dimensions[1]): raise TypeError("Cannot decompose non-square matrices into LU form")
-    size = matrix.dimensions[0]
-    
-    # Find L & U such that A = L@U, and L has all diagonal elements = 1
-
-    # Initialize L as identity
-    # For each column:
-        # Find multiplier to be put in L to make element of U in that row = 0
-        # Find the corresponding row of U by multiplying with element of L and subtracting from A
-        # Uk,j = Ak,j - sum(0, k-1)Lk,s Us,j, j>=k
-        # Li,k = (Ai,k - sum(0, k-1)Li,s Us,k)/Uk,k, i>K
-    
     # P is the permutation matrix to keep track of row swaps when pivoting
-    P = identity(size)
-    L = identity(size)
-    U = Matrix(*[row[:] for row in matrix.vals])
-
-    for i in range(size):
-        pivot = max(range(i,size), key = lambda r: U[r][i])
-        if U[pivot][i] == 0: raise ValueError("The matrix is singular and thus cannot be decomposed")
-
-        # swap rows to put pivot on the top row
-        U[i], U[pivot] = U[pivot], U[i]
-        P[i], P[pivot] = P[pivot], P[i]
-        if i>0:
-            L[i][:i], L[pivot][:i] = L[pivot][:i], L[i][:i]
-        
-        # Eliminate terms from U
-        for j in range(i+1, size):
-            factor = U[j][i]/U[i][i]
-            L[j][i] = factor
-            
-            for k in range(i, size):
-                U[j][k] -= factor*U[i][k]
-        
-    return P, L, U
+    factorization = LUFactorization(matrix)
+    return factorization.P, factorization.L, factorization.U
+
+# Cholesky factorization, A = L@L^T for symmetric positive definite A, about half the work of LU
+
+@instrument.timed("cholesky_factor")
+def cholesky_decompose(matrix : Matrix) -> Matrix :
+    if not matrix.isSymmetric: raise ValueError("Cholesky decomposition needs a symmetric matrix")
+    size = matrix.dimensions[0]
+    mul = operator.mul
+    L = [[0]*size for _ in range(size)]
+    for j in range(size):
+        row_j = L[j]
+        d = matrix.vals[j][j] - sum(map(mul, row_j[:j], row_j[:j]))
+        if not d > 0: raise ValueError("The matrix is not positive definite")
+        ljj = sqrt(d)
+        row_j[j] = ljj
+        head = row_j[:j]
+        for i in range(j+1, size):
+            row_i = L[i]
+            row_i[j] = (matrix.vals[i][j] - sum(map(mul, row_i[:j], head)))/ljj
+    return Matrix(L, storage = matrix.storage)
+
+# Exact (rational) methods using Bareiss fraction-free elimination
+# Rows are scaled to integers first, after which every intermediate value is a minor of the scaled matrix,
+# so entry sizes grow linearly with n instead of exponentially like in naive rational elimination
+
+def _exact_ratio(val) -> tuple[int, int] :
+    if type(val) is int: return val, 1
+    if type(val) is frac: return val.sign*val.num, val.den
+    if isinstance(val, float): return val.as_integer_ratio()
+    if isinstance(val, int): return int(val), 1
+    raise TypeError(f"Cannot use values of type {type(val)} in exact methods")
+
+def _exact_rows(*matrices : Matrix) -> tuple[list[list[int]], list[int]] :
+    # Concatenates the rows of the given matrices and scales each row by the lcm of its denominators
+    rows = []
+    scales = []
+    for i in range(matrices[0].dimensions[0]):
+        ratios = [_exact_ratio(val) for M in matrices for val in M.vals[i]]
+        scale = 1
+        for _, den in ratios:
+            scale = scale // gcd(scale, den) * den
+        rows.append([num * (scale // den) for num, den in ratios])
+        scales.append(scale)
+    return rows, scales
+
+def _bareiss(M : list[list[int]], size : int, jordan : bool = False) -> int :
+    # Eliminates the first size columns of M in place, returns the sign of the row permutation
+    # With jordan = True rows above the pivot are eliminated too, leaving det on the whole diagonal
+    ncols = len(M[0])
+    sign = 1
+    prev = 1
+    for k in range(size):
+        pivot = next((r for r in range(k, size) if M[r][k] != 0), None)
+        if pivot is None: raise ValueError("The matrix is singular")
+        if pivot != k:
+            M[k], M[pivot] = M[pivot], M[k]
+            sign = -sign
+
+        row_k = M[k]
+        pivot_val = row_k[k]
+        for i in range(0 if jordan else k+1, size):
+            if i == k: continue
+            row_i = M[i]
+            factor = row_i[k]
+            for j in range(k+1, ncols):
+                row_i[j] = (pivot_val*row_i[j] - factor*row_k[j]) // prev
+            row_i[k] = 0
+            if i < k: row_i[i] = pivot_val
+        prev = pivot_val
+    return sign
+
+def exact_determinant(matrix : Matrix) -> frac :
+    if not matrix.isSquare: raise TypeError("Determinant is only defined for square matrices")
+    M, scales = _exact_rows(matrix)
+    size = matrix.dimensions[0]
+    try:
+        sign = _bareiss(M, size)
+    except ValueError:
+        return frac(0)
+    den = 1
+    for scale in scales: den *= scale
+    return frac(sign*M[-1][size-1], den)
+
+def exact_solve(A : Matrix, B : Matrix) -> Matrix :
+    if not A.isSquare: raise TypeError("Exact solving requires a square coefficient matrix")
+    if A.dimensions[0] != B.dimensions[0]: raise ValueError(f"Dimensions of A and B are incompatible, got ({A.dimensions[0]}x{A.dimensions[1]}) and ({B.dimensions[0]}x{B.dimensions[1]})")
+    size = A.dimensions[0]
+    M, _ = _exact_rows(A, B)
+    _bareiss(M, size, jordan = True)
+    # Every diagonal entry is now the (signed) determinant d, and row i reads d*x_i = M[i][size:]
+    return Matrix([[frac(val, M[i][i]) for val in M[i][size:]] for i in range(size)], storage = "list")
+
+def exact_inverse(matrix : Matrix) -> Matrix :
+    if not matrix.isSquare: raise TypeError("Cannot invert non-square matrices")
+    return exact_solve(matrix, identity(matrix.dimensions[0]))
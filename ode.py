@@ -1,4 +1,13 @@
-from linear import solve_system as solve_sys
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from math import ceil
+import pickle
+import weakref
+
+import instrument
+from linear import BandedMatrix, banded_solve, solve_system as solve_sys
 import matrix
 
 # Methods to solve ordinary differential equations
@@ -18,100 +27,319 @@ def make_system(eqn : callable, order : int) -> callable :
    
 # general ode solver
 
-def ode(order : int, method : str, eqn : callable, indep_var_range : tuple, init_values : list, h : float = 0.1, tolerance : float|None = None) -> list[list]:
+def _sweep(base_method : callable, system : callable, state : list, limit : float, h : float, direction : bool, tolerance : float|None, kwargs : dict):
+    # Yields every state [x, y, y', ...] from (but not including) state until x passes limit, then returns the final h
+    vars = state
+    while (vars[0] < limit) if direction else (vars[0] > limit):
+        x = vars[0]
+        vars, h = base_method(system, vars[0], vars[1:], h, direction = direction, tolerance = tolerance, **kwargs)
+        instrument.step(vars[0] - x)
+        yield vars
+    return h
+
+def ode_stream(order : int, method : str, eqn : callable, indep_var_range : tuple, init_values : list, h : float = 0.1, tolerance : float|None = None, **kwargs):
+    # Generator version of ode, yields states [x, y, y', ...] as they are computed without storing them:
+    # the initial state, then the backward sweep (decreasing x), then the forward sweep
     base_method = globals()[method.lower()]
-    system = make_system(eqn, order)
+    system = make_system(instrument.counted(eqn), order)
+    vars = list(init_values)
+    yield vars
+    h = yield from _sweep(base_method, system, vars, indep_var_range[0], h, False, tolerance, kwargs)
+    yield from _sweep(base_method, system, vars, indep_var_range[1], h, True, tolerance, kwargs)
+
+class _Trajectory:
+    # One array('d') per variable, appends grow the buffers geometrically so storing n states is O(n)
+    # The first state holding anything other than a float (int, complex, frac, ...) switches the columns to plain
+    # lists, so values come back with the types the stepper produced
+    # Keeps every k-th state of a sweep, plus its last state
+    def __init__(self, width : int, every : int = 1, count : int = 0):
+        self.columns = [array("d") for _ in range(width)]
+        self.packed = True
+        self.every = every
+        self.count = count
+        self.pending = None
+
+    def _store(self, state : list):
+        if self.packed and not all(type(val) is float for val in state):
+            self.columns = [column.tolist() for column in self.columns]
+            self.packed = False
+        for column, val in zip(self.columns, state): column.append(val)
+
+    def add(self, state : list):
+        if self.count % self.every == 0:
+            self._store(state)
+            self.pending = None
+        else:
+            self.pending = state
+        self.count += 1
+
+    def finish(self) -> list :
+        if self.pending is not None:
+            self._store(self.pending)
+            self.pending = None
+        return self.columns
+
+def _join(backward : _Trajectory, forward : _Trajectory) -> list[list] :
+    # Backward sweep flipped, followed by the forward sweep, as lists
+    return [list(back[::-1]) + list(fwd) for back, fwd in zip(backward.finish(), forward.finish())]
+
+def ode(order : int, method : str, eqn : callable, indep_var_range : tuple, init_values : list, h : float = 0.1, tolerance : float|None = None, every : int = 1, final_only : bool = False, return_stats : bool = False, **kwargs) -> list[list]:
+    # every = k keeps only every k-th step (and the ends of the range), final_only keeps only the state at the upper
+    # end of the range (the backward sweep is skipped), memory is then bounded regardless of the number of steps
+    # return_stats = True returns (vars_list, instrument.Stats) with evaluation counts and step statistics
+    # Extra keyword arguments are passed on to the stepping method
+    if return_stats:
+        with instrument.profile() as stats:
+            out = ode(order, method, eqn, indep_var_range, init_values, h, tolerance, every, final_only, **kwargs)
+        return out, stats
+    if every < 1: raise ValueError(f"every must be a positive integer, got {every}")
+    base_method = globals()[method.lower()]
+    system = make_system(instrument.counted(eqn), order)
     vars = list(init_values)
-    vars_list = [[] for i in range(len(vars))]
 
-    for i in range(len(vars)):
-        vars_list[i].append(vars[i])
+    if final_only:
+        for vars in _sweep(base_method, system, vars, indep_var_range[1], h, True, tolerance, kwargs): pass
+        return [[val] for val in vars]
 
-    while vars[0] > indep_var_range[0]:
-        vars, h = base_method(system, vars[0], vars[1:], h, direction = False, tolerance = tolerance)
-        for i in range(len(vars)):
-            vars_list[i].insert(0, vars[i])
+    # The backward sweep is stored in the order it is computed and flipped once at the end, instead of inserting at the front
+    # Step counting starts at the initial state, which is stored with the forward sweep
+    backward = _Trajectory(len(vars), every, count = 1)
+    h = _drain(backward, _sweep(base_method, system, vars, indep_var_range[0], h, False, tolerance, kwargs))
+    forward = _Trajectory(len(vars), every)
+    forward.add(vars)
+    _drain(forward, _sweep(base_method, system, vars, indep_var_range[1], h, True, tolerance, kwargs))
 
-    vars = list(init_values)
+    return _join(backward, forward)
 
-    while vars[0] < indep_var_range[1]:
-        vars, h = base_method(system, vars[0], vars[1:], h, direction = True, tolerance = tolerance)
-        for i in range(len(vars)):
-            vars_list[i].append(vars[i])
-    
-    return vars_list
+def _drain(trajectory : _Trajectory, sweep) -> float :
+    # Drains a sweep into a trajectory, returning the sweep's final step size
+    while True:
+        try:
+            trajectory.add(next(sweep))
+        except StopIteration as stop:
+            return stop.value
 
 # shooting method
 
-def bound_ode(order : int, method : str, eqn : callable, indep_var_range : tuple, points : list[list], h : float = 0.01, tolerance : float|None = None, **kwargs) -> list[list]:
-    
-    init_point = list(points[0])
-    unknown_indices = []
-    for i in range(len(points[0])):
-        if points[0][i] == None: unknown_indices.append(i)
-    
-    if len(unknown_indices) == 0: return ode(order, method, eqn, indep_var_range, init_point, h, tolerance)
-        
-    req_indices = [[] for _ in range(len(points) - 1)]
-    for i in range(1, len(points)):
-        for j in range(len(points[i])):
-            if points[i][j] != None: req_indices[i-1].append(j)
-    
-    num_req_indices = 0
-    for point in req_indices: num_req_indices += len(point)-1
-    
-    # take initial jacobian (identity) and initial residual (all zeroes), which will generate first guess to be all zeroes
-    # within newton loop:
-        # take guess using current jacobian and check result
-        # populate residual from the current guess
-        # perturb all degrees of freedom in a for loop, and measure error for each perturbation (fill jacobian by measuring errors compared to the previous residual)
-        # use jacobian to generate next best guess
-    
-    if num_req_indices < len(unknown_indices): raise ValueError(f"Too few boundary values given, needed {len(unknown_indices)}, got {num_req_indices}")
-    if num_req_indices > len(unknown_indices): raise ValueError(f"Too many boundary values to fit, needed {len(unknown_indices)}, got {num_req_indices}")
+def _shoot(order : int, method : str, eqn : callable, indep_var_range : tuple, init_point : list, h : float, tolerance : float|None, kwargs : dict) -> list[list] :
+    # Top level so it can be sent to worker processes
+    return ode(order, method, eqn, indep_var_range, init_point, h, tolerance, **kwargs)
+
+def _picklable(*objects) -> bool :
+    # Lambdas and closures (the usual eqn) can't be sent to worker processes, bound_ode then runs serially
+    try:
+        pickle.dumps(objects)
+        return True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+def _value_at(vals : list[list], x : float, idx : int) -> float :
+    # Linear interpolation of variable idx at x, the x column of ode's output is sorted
+    xs = vals[0]
+    pos = bisect_right(xs, x)
+    if pos == 0: return vals[idx][0]
+    if pos == len(xs): return vals[idx][-1]
+    x0, x1 = xs[pos-1], xs[pos]
+    t = (x - x0)/(x1 - x0)
+    return vals[idx][pos-1] + t*(vals[idx][pos] - vals[idx][pos-1])
+
+def bound_ode(order : int, method : str, eqn : callable, indep_var_range : tuple, points : list[list], h : float = 0.01, tolerance : float|None = None, workers : int = 1, max_iter : int = 50, **kwargs) -> list[list]:
+    # points[0] is the initial point with None for the unknown values, every later point [x, y, yd, ...] gives the
+    # values required at x (None for the free ones). The unknowns are found by Newton's method on the boundary residuals
+    # The Jacobian is built by finite differences (one integration per unknown, spread over workers processes when eqn
+    # is picklable, serial otherwise), and between rebuilds it is updated with Broyden's rank one formula while the residual keeps
+    # halving. Raises RuntimeError if the residuals aren't within tolerance (default 1e-6) after max_iter iterations
 
-    # Initial Jacobian
-    jacobian = matrix.identity(num_req_indices)
-    residual = matrix.zeroes(num_req_indices, 1)
-    guess = matrix.zeroes(num_req_indices, 1)
-
-    while True:
-        # Take guess using jacobian (using linear equation solver)
-        guess -= solve_sys(jacobian, residual)
-        guessed_init_point = [guess[unknown_indices.index(i),0] if i in unknown_indices else init_point[i] for i in range(len(init_point))]
-        vals = ode(order, method, eqn, indep_var_range, init_values = guessed_init_point, h = h, tolerance = tolerance)
-
-        # Populate residual
+    init_point = list(points[0])
+    unknown_indices = [i for i in range(len(init_point)) if init_point[i] is None]
+
+    if len(unknown_indices) == 0: return ode(order, method, eqn, indep_var_range, init_point, h, tolerance, **kwargs)
+
+    # (x, index, value) for every required boundary value
+    targets = [(point[0], j, point[j]) for point in points[1:] for j in range(1, len(point)) if point[j] is not None]
+
+    if len(targets) < len(unknown_indices): raise ValueError(f"Too few boundary values given, needed {len(unknown_indices)}, got {len(targets)}")
+    if len(targets) > len(unknown_indices): raise ValueError(f"Too many boundary values to fit, needed {len(unknown_indices)}, got {len(targets)}")
+
+    size = len(unknown_indices)
+    residual_tol = 1e-6 if tolerance is None else tolerance
+
+    def start(guess : list) -> list :
+        point = list(init_point)
+        for i, val in zip(unknown_indices, guess): point[i] = val
+        return point
+
+    def residual(vals : list[list]) -> list :
+        return [value - _value_at(vals, x, j) for x, j, value in targets]
+
+    def shoot_all(guesses : list[list]) -> list[list[list]] :
+        args = [(order, method, eqn, indep_var_range, start(guess), h, tolerance, kwargs) for guess in guesses]
+        nonlocal executor
+        if executor is not None:
+            try:
+                return list(executor.map(_shoot, *zip(*args)))
+            except (OSError, BrokenProcessPool, pickle.PicklingError, AttributeError, TypeError):
+                # No usable pool, or something that can't be sent to it, the runs are repeated serially
+                executor.shutdown()
+                executor = None
+        return [_shoot(*arg) for arg in args]
+
+    def finite_difference(guess : list, res : list) -> list[list] :
+        perturbed = []
+        for k in range(size):
+            point = list(guess)
+            point[k] += h
+            perturbed.append(point)
+        columns = [[(a - b)/h for a, b in zip(residual(vals), res)] for vals in shoot_all(perturbed)]
+        return [list(row) for row in zip(*columns)]
+
+    executor = None
+    if workers > 1 and _picklable(eqn, kwargs):
+        try:
+            executor = ProcessPoolExecutor(workers)
+        except OSError:
+            executor = None
+    try:
+        guess = [0.0]*size
+        vals = _shoot(order, method, eqn, indep_var_range, start(guess), h, tolerance, kwargs)
+        res = residual(vals)
+        jacobian = None
+        for _ in range(max_iter):
+            if all(abs(r) < residual_tol for r in res): return vals
+            if jacobian is None: jacobian = finite_difference(guess, res)
+
+            step = solve_sys(matrix.Matrix([list(row) for row in jacobian]), matrix.Matrix([[r] for r in res]))
+            new_guess = [g - step[k, 0] for k, g in enumerate(guess)]
+            vals = _shoot(order, method, eqn, indep_var_range, start(new_guess), h, tolerance, kwargs)
+            new_res = residual(vals)
+
+            if sum(r*r for r in new_res) < 0.25*sum(r*r for r in res):
+                # Converging well, Broyden update J += (dr - J dg) dg^T / (dg . dg) instead of a new finite difference pass
+                dg = [a - b for a, b in zip(new_guess, guess)]
+                norm = sum(d*d for d in dg)
+                if norm > 0:
+                    for row, r_new, r_old in zip(jacobian, new_res, res):
+                        u = (r_new - r_old - sum(a*d for a, d in zip(row, dg)))/norm
+                        row[:] = [a + u*d for a, d in zip(row, dg)]
+            else:
+                jacobian = None
+            guess, res = new_guess, new_res
+        if all(abs(r) < residual_tol for r in res): return vals
+        raise RuntimeError(f"Shooting did not converge in {max_iter} iterations, largest boundary residual {max(abs(r) for r in res)}")
+    finally:
+        if executor is not None: executor.shutdown()
+
+# collocation method
+
+def _boundary_conditions(points : list[list], order : int) -> list[tuple[float, int, float]] :
+    # (x, index into [y, yd, ...], value) for every known value in points
+    conditions = [(point[0], j-1, point[j]) for point in points for j in range(1, len(point)) if point[j] is not None]
+    if len(conditions) != order: raise ValueError(f"Expected {order} boundary values for an order {order} equation, got {len(conditions)}")
+    return conditions
+
+def _collocation_newton(system : callable, xs : list, Z : list[list], conditions : list, jacobian : callable, tol : float, max_iter : int) -> list[list] :
+    # Newton's method on the trapezoid equations z[i+1] - z[i] - (x[i+1] - x[i])/2 (f[i] + f[i+1]) = 0 and the boundary
+    # conditions. Unknowns are numbered node by node, and the rows of node i (its boundary conditions, then the equations
+    # of the interval to its right) sit next to its columns, so the Newton matrix is banded
+    n = len(Z[0])
+    nodes = len(xs)
+    size = n*nodes
+    at_node = [[] for _ in range(nodes)]
+    for x, j, value in conditions:
+        at_node[min(range(nodes), key = lambda i: abs(xs[i] - x))].append((j, value))
+
+    def residual(Z : list[list], F : list[list]) -> list :
+        out = []
+        for i in range(nodes):
+            out.extend(Z[i][j] - value for j, value in at_node[i])
+            if i < nodes - 1:
+                half = (xs[i+1] - xs[i])/2
+                out.extend(Z[i+1][m] - Z[i][m] - half*(F[i][m] + F[i+1][m]) for m in range(n))
+        return out
+
+    F = [system(x, z) for x, z in zip(xs, Z)]
+    res = residual(Z, F)
+    for _ in range(max_iter):
+        Js = [_jacobian(system, x, z, f, jacobian, None) for x, z, f in zip(xs, Z, F)]
+        # (row, column, value) entries, then packed into band storage
+        entries = []
         row = 0
-        for i in range(len(req_indices)):
-            indices = req_indices[i]
-            pos = min(range(len(vals[0])), key = lambda x: abs(vals[0][x] - points[i+1][indices[0]]))
-            for j in indices[1:]:
-                residual[row, 0] = points[1+i][j] - vals[j][pos]
+        for i in range(nodes):
+            for j, _ in at_node[i]:
+                entries.append((row, i*n + j, 1.0))
                 row += 1
-        
-        # check if all required values are within tolerance
-        if all(abs(residual[i,0]) < tolerance for i in range(num_req_indices)):
-            print(guessed_init_point)
-            return vals
-
-        # Perturb all degrees of freedom
-        perturbed_residual = matrix.zeroes(num_req_indices, 1)
-        for i in range(len(unknown_indices)):
-            perturbed_guess = guess.copy()
-            perturbed_guess[i,0] += h
-            perturbed_init_point = [perturbed_guess[unknown_indices.index(i),0] if i in unknown_indices else init_point[i] for i in range(len(init_point))]
-            perturbed_vals = ode(order, method, eqn, indep_var_range, init_values = perturbed_init_point, h = h, tolerance = tolerance)
-
-            row = 0
-            for k in range(len(req_indices)):
-                indices = req_indices[k]
-                pos = min(range(len(vals[0])), key = lambda x: abs(vals[0][x] - points[k+1][indices[0]]))
-                for j in indices[1:]:
-                    perturbed_residual[row, 0] = points[1+k][j] - perturbed_vals[j][pos]
+            if i < nodes - 1:
+                half = (xs[i+1] - xs[i])/2
+                for m in range(n):
+                    for k in range(n):
+                        entries.append((row, i*n + k, (-1.0 if m == k else 0.0) - half*Js[i][m][k]))
+                        entries.append((row, (i+1)*n + k, (1.0 if m == k else 0.0) - half*Js[i+1][m][k]))
                     row += 1
-                
-                jacobian[k,i] = (perturbed_residual[k,0] - residual[k,0])/h
+        lower = max(r - c for r, c, _ in entries)
+        upper = max(c - r for r, c, _ in entries)
+        A = BandedMatrix(size, max(lower, 0), max(upper, 0))
+        for r, c, val in entries:
+            if val: A.bands[r][c - r + A.lower] += val
+        step = banded_solve(A, matrix.Matrix([[-r] for r in res]))
+        dz = [step[k, 0] for k in range(size)]
+
+        # Damped step, halved until the residual decreases
+        norm = sum(r*r for r in res)
+        damping = 1.0
+        for _ in range(10):
+            trial = [[Z[i][m] + damping*dz[i*n + m] for m in range(n)] for i in range(nodes)]
+            trial_F = [system(x, z) for x, z in zip(xs, trial)]
+            trial_res = residual(trial, trial_F)
+            if sum(r*r for r in trial_res) < norm or damping < 1e-3: break
+            damping /= 2
+        Z, F, res = trial, trial_F, trial_res
+        if max(abs(damping*d)/(1 + abs(z)) for d, z in zip(dz, (v for zi in Z for v in zi))) < tol: return Z
+    raise RuntimeError(f"Newton iteration did not converge in {max_iter} iterations, largest residual {max(abs(r) for r in res)}")
+
+def bound_ode_collocation(order : int, eqn : callable, indep_var_range : tuple, points : list[list], h : float = 0.1, tolerance : float|None = None, max_nodes : int = 10000, max_iter : int = 50, jacobian : callable = None) -> list[list]:
+    # Alternative to bound_ode that solves for the whole solution at once instead of shooting, so it doesn't need an
+    # initial value integration that stays stable. Takes the same points (every known value, None elsewhere, at any x in
+    # the range) and returns the same vars_list, on the final mesh
+    # The mesh starts with spacing h plus every boundary point; after each solve the residual of the piecewise cubic
+    # Hermite interpolant is checked at every interval midpoint, and intervals where it is above tolerance (default 1e-6)
+    # are halved, until none are or the mesh would exceed max_nodes (RuntimeError)
+    # jacobian(x, y, yd, ...) can give the gradient of eqn, as for the implicit steppers
+    tol = 1e-6 if tolerance is None else tolerance
+    conditions = _boundary_conditions(points, order)
+    a, b = indep_var_range
+    if any(not a <= x <= b for x, _, _ in conditions): raise ValueError(f"Boundary points must lie in the range {indep_var_range}")
+    system = make_system(eqn, order)
+
+    count = max(1, ceil((b - a)/h))
+    xs = sorted(set([a + (b - a)*i/count for i in range(count + 1)] + [x for x, _, _ in conditions]))
+    Z = [[0.0]*order for _ in xs]
+
+    while True:
+        Z = _collocation_newton(system, xs, Z, conditions, jacobian, tol*1e-3, max_iter)
+        F = [system(x, z) for x, z in zip(xs, Z)]
+
+        new_xs, new_Z = [xs[0]], [Z[0]]
+        refined = False
+        for i in range(len(xs) - 1):
+            step = xs[i+1] - xs[i]
+            z0, z1, f0, f1 = Z[i], Z[i+1], F[i], F[i+1]
+            # Hermite interpolant and its derivative at the midpoint
+            mid = [(p + q)/2 + step*(fp - fq)/8 for p, q, fp, fq in zip(z0, z1, f0, f1)]
+            slope = [1.5*(q - p)/step - (fp + fq)/4 for p, q, fp, fq in zip(z0, z1, f0, f1)]
+            f_mid = system(xs[i] + step/2, mid)
+            error = max(step*abs(s - f)/(1 + abs(z)) for s, f, z in zip(slope, f_mid, mid))
+            if error > tol:
+                new_xs.append(xs[i] + step/2)
+                new_Z.append(mid)
+                refined = True
+            new_xs.append(xs[i+1])
+            new_Z.append(z1)
+
+        if not refined: break
+        if len(new_xs) > max_nodes: raise RuntimeError(f"Mesh refinement needs more than max_nodes = {max_nodes} nodes to reach tolerance {tol}")
+        xs, Z = new_xs, new_Z
+
+    return [xs] + [[z[m] for z in Z] for m in range(order)]
 
 # General nth order ODEs, fixed step
 
@@ -182,8 +410,575 @@ def euler2(func : callable, indep_var : float, dep_var : list, h : float, tolera
         
         if error == 0: scale = 3
         else: scale = 0.9*((tolerance/error)**0.5)
+        if not error < tolerance: instrument.reject()
 
         h_new *= max(0.1, min(3, scale))
 
         if error < tolerance :
             return outvalues, h_new
+
+# Dormand-Prince 5(4), embedded pair with first-same-as-last (FSAL): the last stage of an accepted step is
+# f(x+h, y+h), so it is reused as the first stage of the next one and a step costs 6 evaluations instead of 7
+
+_dp_c = (0, 1/5, 3/10, 4/5, 8/9, 1, 1)
+_dp_a = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+# Difference between the 5th and 4th order weights, for the error estimate
+_dp_e = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+# Dense output coefficients (Hairer, Norsett & Wanner, dopri5)
+_dp_d = (-12715105075/11282082432, 0, 87487479700/32700410799, -10690763975/1880347072, 701980252875/199316789632, -1453857185/822651844, 69997945/29380423)
+
+# PI step size controller, h_new = h * safety * err^-alpha * err_old^beta, clipped to [min_factor, max_factor]
+_pi_alpha = 0.17
+_pi_beta = 0.04
+_safety = 0.9
+_min_factor = 0.2
+_max_factor = 10.0
+
+# Per system state carried between calls: the FSAL stage, the previous error for the PI controller and the last step
+# for dense output. Keyed weakly on the system function, so the state goes away with the system
+_dopri_state = weakref.WeakKeyDictionary()
+
+def _tolerance_list(tol, n : int) -> list[float] :
+    if isinstance(tol, (list, tuple)):
+        if len(tol) != n: raise ValueError(f"Expected {n} tolerances, got {len(tol)}")
+        return list(tol)
+    return [tol]*n
+
+def _dopri_attempt(func : callable, x : float, y : list, step : float, k1 : list, rtol : list, atol : list) -> tuple[list, list[list], float] :
+    # One trial step, returns the new y, all 7 stages and the scaled RMS error (accept if <= 1)
+    k = [k1]
+    for i in range(1, 7):
+        a = _dp_a[i]
+        yi = [y[m] + step*sum(a[j]*k[j][m] for j in range(i) if a[j]) for m in range(len(y))]
+        k.append(func(x + _dp_c[i]*step, yi))
+    y1 = yi
+    err = 0.0
+    for m in range(len(y)):
+        scale = atol[m] + rtol[m]*max(abs(y[m]), abs(y1[m]))
+        e = step*sum(_dp_e[j]*k[j][m] for j in range(7) if _dp_e[j])
+        err += (e/scale)**2
+    return y1, k, (err/len(y))**0.5
+
+def dopri45(func : callable, indep_var : float, dep_var : list, h : float, direction : bool = True, tolerance : float|None = None, rtol = None, atol = None, **kwargs) -> list :
+    # rtol and atol can be given per component, both default to tolerance (or 1e-6)
+    sign = 1 if direction else -1
+    n = len(dep_var)
+    tolerance = 1e-6 if tolerance is None else tolerance
+    rtol = _tolerance_list(tolerance if rtol is None else rtol, n)
+    atol = _tolerance_list(tolerance if atol is None else atol, n)
+
+    state = _dopri_state.get(func)
+    if state is not None and state["x"] == indep_var and state["y"] == dep_var:
+        k1, err_old = state["k"], state["err"]
+    else:
+        k1, err_old = func(indep_var, dep_var), 1e-4
+
+    rejected = False
+    while True:
+        step = sign*h
+        if indep_var + step == indep_var: raise RuntimeError(f"Step size underflow at x = {indep_var}")
+        y1, k, err = _dopri_attempt(func, indep_var, dep_var, step, k1, rtol, atol)
+        if err <= 1:
+            factor = _max_factor if err == 0 else _safety * err**-_pi_alpha * err_old**_pi_beta
+            factor = min(_max_factor, max(_min_factor, factor))
+            if rejected: factor = min(1.0, factor)
+            x1 = indep_var + step
+            _dopri_state[func] = {"x" : x1, "y" : y1, "k" : k[6], "err" : max(err, 1e-4), "step" : (indep_var, step, dep_var, y1, k)}
+            return [x1] + y1, h*factor
+        h *= max(_min_factor, _safety * err**-0.2)
+        rejected = True
+        instrument.reject()
+
+def _dense_coefficients(step : float, y0 : list, y1 : list, k : list[list]) -> list[list] :
+    coeffs = []
+    for m in range(len(y0)):
+        diff = y1[m] - y0[m]
+        bspl = step*k[0][m] - diff
+        coeffs.append((y0[m], diff, bspl, diff - step*k[6][m] - bspl, step*sum(_dp_d[j]*k[j][m] for j in range(7) if _dp_d[j])))
+    return coeffs
+
+class DenseSolution:
+    # Continuous 4th order interpolant over all dopri45 steps, sol(x) -> [x, y, y', ...]
+    def __init__(self):
+        self.segments = []
+
+    def add(self, x0 : float, step : float, y0 : list, y1 : list, k : list[list]):
+        self.segments.append((min(x0, x0 + step), max(x0, x0 + step), x0, step, _dense_coefficients(step, y0, y1, k)))
+
+    def finish(self):
+        self.segments.sort(key = lambda seg: seg[0])
+        self._starts = [seg[0] for seg in self.segments]
+
+    @staticmethod
+    def _evaluate(segment : tuple, x : float) -> list :
+        _, _, x0, step, coeffs = segment
+        t = (x - x0)/step
+        s = 1 - t
+        return [x] + [c0 + t*(c1 + s*(c2 + t*(c3 + s*c4))) for c0, c1, c2, c3, c4 in coeffs]
+
+    def __call__(self, x : float) -> list :
+        if not self.segments or not self.segments[0][0] <= x <= self.segments[-1][1]: raise ValueError(f"x = {x} is outside the integrated range")
+        idx = max(0, bisect_right(self._starts, x) - 1)
+        return self._evaluate(self.segments[idx], x)
+
+def _locate_event(event : callable, segment : tuple, g0 : float, g1 : float) -> list :
+    # Illinois (modified regula falsi) on the dense interpolant of one step, returns the state at the root
+    _, _, x0, step, _ = segment
+    t0, t1 = 0.0, 1.0
+    side = 0
+    state = None
+    for _ in range(100):
+        t = (t0*g1 - t1*g0)/(g1 - g0)
+        state = DenseSolution._evaluate(segment, x0 + t*step)
+        g = event(*state)
+        if g == 0 or abs(t1 - t0) < 1e-14: break
+        if (g > 0) == (g1 > 0):
+            t1, g1 = t, g
+            if side == -1: g0 /= 2
+            side = -1
+        else:
+            t0, g0 = t, g
+            if side == 1: g1 /= 2
+            side = 1
+    return state
+
+def ode_dense(order : int, eqn : callable, indep_var_range : tuple, init_values : list, h : float = 0.1, tolerance : float|None = None, events : list[callable]|None = None, **kwargs) -> tuple[list[list], DenseSolution, list[list[list]]] :
+    # Integrates with dopri45 like ode, landing exactly on the ends of the range, and additionally returns
+    #   a DenseSolution that interpolates the solution anywhere in the integrated range
+    #   for every event function g(x, y, yd, ...), the list of states [x, y, yd, ...] where g changes sign
+    # An event function with g.terminal = True stops the sweep it is detected in at the first root
+    events = events or []
+    system = make_system(instrument.counted(eqn), order)
+    solution = DenseSolution()
+    found = [[] for _ in events]
+    init = list(init_values)
+    sweeps = []
+
+    for direction, limit in ((False, indep_var_range[0]), (True, indep_var_range[1])):
+        vars = init
+        states = []
+        g_prev = [event(*vars) for event in events]
+        h_next = h
+        while (vars[0] < limit) if direction else (vars[0] > limit):
+            h_step = min(h_next, abs(limit - vars[0]))
+            new, h_next = dopri45(system, vars[0], vars[1:], h_step, direction = direction, tolerance = tolerance, **kwargs)
+            # Snap onto the end of the range only if the clamped step was actually taken, not shrunk after a rejection
+            x0, step, y0, y1, k = _dopri_state[system]["step"]
+            if abs(step) == h_step == abs(limit - vars[0]): new[0] = limit
+            solution.add(x0, step, y0, y1, k)
+            segment = solution.segments[-1]
+
+            stop = None
+            for i, event in enumerate(events):
+                g = event(*new)
+                if g_prev[i] != 0 and (g == 0 or (g > 0) != (g_prev[i] > 0)):
+                    hit = new if g == 0 else _locate_event(event, segment, g_prev[i], g)
+                    found[i].append(hit)
+                    if getattr(event, "terminal", False) and (stop is None or abs(hit[0] - x0) < abs(stop[0] - x0)): stop = hit
+                g_prev[i] = g
+            if stop is not None:
+                states.append(stop)
+                break
+            states.append(new)
+            vars = new
+        sweeps.append(states)
+
+    solution.finish()
+    trajectory = sweeps[0][::-1] + [init] + sweeps[1]
+    for hits in found: hits.sort(key = lambda state: state[0])
+    return [list(column) for column in zip(*trajectory)], solution, found
+
+# Implicit methods for stiff equations
+# Both need the Jacobian J = df/dy of the system. By default it is estimated by finite differences, or jacobian(x, y, yd, ...)
+# can give the gradient of eqn, [d eqn/dy, d eqn/dyd, ...], which fills the last row of J (the rows above only shift y, y', ...)
+# A stats dict, if passed, is updated with counts of RHS and Jacobian evaluations, LU factorizations and solves, and steps
+# for that call alone; the same events also show up in an instrument.profile() (timings for the LU work)
+
+_eps = 2.0**-52
+
+def _count(stats : dict|None, key : str, k : int = 1):
+    if stats is not None: stats[key] = stats.get(key, 0) + k
+
+def _rms(vals : list, scale : list) -> float :
+    return (sum((v/s)**2 for v, s in zip(vals, scale))/len(vals))**0.5
+
+def _jacobian(func : callable, x : float, y : list, f0 : list, jacobian : callable, stats : dict|None) -> list[list] :
+    _count(stats, "jacobian_evals")
+    instrument.record("jacobian_evals")
+    n = len(y)
+    if jacobian is not None:
+        J = [[1.0 if j == i+1 else 0.0 for j in range(n)] for i in range(n-1)]
+        J.append(list(jacobian(x, *y)))
+        return J
+    # Forward differences, one column per component
+    columns = []
+    for j in range(n):
+        delta = _eps**0.5 * max(1.0, abs(y[j]))
+        shifted = list(y)
+        shifted[j] += delta
+        fj = func(x, shifted)
+        columns.append([(a - b)/delta for a, b in zip(fj, f0)])
+    _count(stats, "rhs_evals", n)
+    return [list(row) for row in zip(*columns)]
+
+def _iteration_matrix(J : list[list], c : float, stats : dict|None) -> matrix.LUFactorization :
+    # LU of I - c*J, raises ValueError if it is singular
+    _count(stats, "lu_factorizations")
+    n = len(J)
+    return matrix.LU_factor(matrix.Matrix([[(1.0 if i == j else 0.0) - c*J[i][j] for j in range(n)] for i in range(n)]))
+
+# Variable order (1 to 5), variable step BDF in the backward difference form of Shampine & Reichelt
+# D[k] is the k-th backward difference of y at the current step size; changing the step size rescales D through the
+# interpolating polynomial, and the LU of I - c*J is reused across steps until h or the order changes. The Jacobian
+# itself is only re-evaluated when the Newton iteration fails to converge with the current one
+
+_bdf_max_order = 5
+_newton_max_iter = 4
+_bdf_gamma = [0.0]
+for _j in range(1, _bdf_max_order + 1): _bdf_gamma.append(_bdf_gamma[-1] + 1/_j)
+_bdf_error_const = [1/(j + 1) for j in range(_bdf_max_order + 2)]
+
+_bdf_state = weakref.WeakKeyDictionary()
+
+def _bdf_r(order : int, factor : float) -> list[list] :
+    M = [[1.0]*(order+1)] + [[0.0] + [(i - 1 - factor*j)/i for j in range(1, order+1)] for i in range(1, order+1)]
+    for i in range(1, order+1): M[i] = [a*b for a, b in zip(M[i-1], M[i])]
+    return M
+
+def _bdf_rescale(D : list[list], order : int, factor : float):
+    # D[:order+1] <- (R U)^T D[:order+1], the differences of the same polynomial on a grid with spacing factor*h
+    R = _bdf_r(order, factor)
+    U = _bdf_r(order, 1)
+    size = range(order+1)
+    RU = [[sum(R[i][k]*U[k][j] for k in size) for j in size] for i in size]
+    D[:order+1] = [[sum(RU[k][i]*D[k][m] for k in size) for m in range(len(D[0]))] for i in size]
+
+def _bdf_newton(func : callable, x : float, y_predict : list, psi : list, c : float, lu : matrix.LUFactorization, scale : list, tol : float, stats : dict|None) -> tuple[bool, int, list, list] :
+    # Simplified Newton on y - c*f(x, y) - psi... = 0, returns (converged, iterations, y, y - y_predict)
+    y = list(y_predict)
+    d = [0.0]*len(y)
+    norm_old = None
+    converged = False
+    for k in range(_newton_max_iter):
+        f = func(x, y)
+        _count(stats, "rhs_evals")
+        _count(stats, "lu_solves")
+        dy = lu.solve_vector([c*fi - p - di for fi, p, di in zip(f, psi, d)])
+        norm = _rms(dy, scale)
+        rate = None if norm_old is None else norm/norm_old
+        if rate is not None and (rate >= 1 or rate**(_newton_max_iter - k)/(1 - rate)*norm > tol): break
+        y = [a + b for a, b in zip(y, dy)]
+        d = [a + b for a, b in zip(d, dy)]
+        if norm == 0 or (rate is not None and rate/(1 - rate)*norm < tol):
+            converged = True
+            break
+        norm_old = norm
+    return converged, k + 1, y, d
+
+def bdf(func : callable, indep_var : float, dep_var : list, h : float, direction : bool = True, tolerance : float|None = None, rtol = None, atol = None, jacobian : callable = None, stats : dict|None = None, **kwargs) -> list :
+    sign = 1 if direction else -1
+    n = len(dep_var)
+    tolerance = 1e-6 if tolerance is None else tolerance
+    rtol = _tolerance_list(tolerance if rtol is None else rtol, n)
+    atol = _tolerance_list(tolerance if atol is None else atol, n)
+    newton_tol = max(10*_eps/min(rtol), min(0.03, min(rtol)**0.5))
+
+    state = _bdf_state.get(func)
+    if state is None or state["x"] != indep_var or state["y"] != dep_var or state["sign"] != sign:
+        # Fresh start at order 1
+        f0 = func(indep_var, dep_var)
+        _count(stats, "rhs_evals")
+        D = [[0.0]*n for _ in range(_bdf_max_order + 3)]
+        D[0] = list(dep_var)
+        D[1] = [sign*h*f for f in f0]
+        state = {"sign" : sign, "h" : h, "order" : 1, "D" : D, "equal" : 0, "J" : _jacobian(func, indep_var, dep_var, f0, jacobian, stats), "current" : True, "lu" : None}
+        _bdf_state[func] = state
+    elif state["h"] != h:
+        _bdf_rescale(state["D"], state["order"], h/state["h"])
+        state["equal"] = 0
+        state["lu"] = None
+    D = state["D"]
+    order = state["order"]
+
+    while True:
+        step = sign*h
+        x_new = indep_var + step
+        if x_new == indep_var: raise RuntimeError(f"Step size underflow at x = {indep_var}")
+        y_predict = [sum(D[k][m] for k in range(order+1)) for m in range(n)]
+        scale = [atol[m] + rtol[m]*abs(y_predict[m]) for m in range(n)]
+        psi = [sum(D[k][m]*_bdf_gamma[k] for k in range(1, order+1))/_bdf_gamma[order] for m in range(n)]
+        c = step/_bdf_gamma[order]
+
+        converged = False
+        if state["lu"] is None:
+            try:
+                state["lu"] = _iteration_matrix(state["J"], c, stats)
+            except ValueError:
+                state["lu"] = None
+        if state["lu"] is not None:
+            converged, iterations, y_new, d = _bdf_newton(func, x_new, y_predict, psi, c, state["lu"], scale, newton_tol, stats)
+
+        if not converged:
+            if not state["current"]:
+                # Retry with a fresh Jacobian before cutting the step
+                f = func(x_new, y_predict)
+                _count(stats, "rhs_evals")
+                state["J"] = _jacobian(func, x_new, y_predict, f, jacobian, stats)
+                state["current"] = True
+            else:
+                _bdf_rescale(D, order, 0.5)
+                h *= 0.5
+                state["equal"] = 0
+                _count(stats, "rejected")
+                instrument.reject()
+            state["lu"] = None
+            continue
+
+        safety = 0.9*(2*_newton_max_iter + 1)/(2*_newton_max_iter + iterations)
+        scale = [atol[m] + rtol[m]*abs(y_new[m]) for m in range(n)]
+        error_norm = _rms([_bdf_error_const[order]*v for v in d], scale)
+        if error_norm > 1:
+            factor = max(_min_factor, safety*error_norm**(-1/(order + 1)))
+            _bdf_rescale(D, order, factor)
+            h *= factor
+            state["equal"] = 0
+            state["lu"] = None
+            _count(stats, "rejected")
+            instrument.reject()
+            continue
+        break
+
+    _count(stats, "steps")
+    state["current"] = False
+    state["equal"] += 1
+    D[order+2] = [a - b for a, b in zip(d, D[order+1])]
+    D[order+1] = d
+    for k in range(order, -1, -1):
+        D[k] = [a + b for a, b in zip(D[k], D[k+1])]
+
+    if state["equal"] >= order + 1:
+        # Pick the order (one down, same, one up) that allows the largest next step
+        norms = [
+            _rms([_bdf_error_const[order-1]*v for v in D[order]], scale) if order > 1 else float("inf"),
+            error_norm,
+            _rms([_bdf_error_const[order+1]*v for v in D[order+2]], scale) if order < _bdf_max_order else float("inf"),
+        ]
+        factors = [norm**(-1/(order + k)) if norm > 0 else _max_factor for k, norm in enumerate(norms)]
+        best = max(range(3), key = factors.__getitem__)
+        order += best - 1
+        factor = min(_max_factor, safety*factors[best])
+        _bdf_rescale(D, order, factor)
+        h *= factor
+        state["equal"] = 0
+        state["lu"] = None
+
+    state.update({"x" : x_new, "y" : y_new, "h" : h, "order" : order})
+    return [x_new] + y_new, h
+
+# Rosenbrock 2(3) of Shampine & Reichelt (MATLAB's ode23s), linearly implicit so no Newton iteration is needed
+# Its last stage evaluation is f at the new point, which is reused as the first one of the next step (FSAL)
+# The Jacobian is evaluated once per step and kept, along with the LU of I - h*d*J, when a step is rejected
+
+_ros_d = 1/(2 + 2**0.5)
+_ros_e32 = 6 + 2**0.5
+
+_rosenbrock_state = weakref.WeakKeyDictionary()
+
+def rosenbrock(func : callable, indep_var : float, dep_var : list, h : float, direction : bool = True, tolerance : float|None = None, rtol = None, atol = None, jacobian : callable = None, stats : dict|None = None, **kwargs) -> list :
+    sign = 1 if direction else -1
+    n = len(dep_var)
+    tolerance = 1e-6 if tolerance is None else tolerance
+    rtol = _tolerance_list(tolerance if rtol is None else rtol, n)
+    atol = _tolerance_list(tolerance if atol is None else atol, n)
+
+    state = _rosenbrock_state.get(func)
+    if state is not None and state["x"] == indep_var and state["y"] == dep_var:
+        f0 = state["f"]
+    else:
+        f0 = func(indep_var, dep_var)
+        _count(stats, "rhs_evals")
+    J = _jacobian(func, indep_var, dep_var, f0, jacobian, stats)
+    # df/dx, for equations that depend on x explicitly
+    delta = sign*_eps**0.5*max(1.0, abs(indep_var))
+    T = [(a - b)/delta for a, b in zip(func(indep_var + delta, dep_var), f0)]
+    _count(stats, "rhs_evals")
+
+    while True:
+        step = sign*h
+        x_new = indep_var + step
+        if x_new == indep_var: raise RuntimeError(f"Step size underflow at x = {indep_var}")
+        try:
+            lu = _iteration_matrix(J, step*_ros_d, stats)
+        except ValueError:
+            h *= 0.5
+            _count(stats, "rejected")
+            instrument.reject()
+            continue
+        hdT = [step*_ros_d*t for t in T]
+
+        k1 = lu.solve_vector([f + t for f, t in zip(f0, hdT)])
+        f1 = func(indep_var + step/2, [y + step/2*k for y, k in zip(dep_var, k1)])
+        k2 = [a + b for a, b in zip(lu.solve_vector([f - k for f, k in zip(f1, k1)]), k1)]
+        y_new = [y + step*k for y, k in zip(dep_var, k2)]
+        f2 = func(x_new, y_new)
+        k3 = lu.solve_vector([f2[m] - _ros_e32*(k2[m] - f1[m]) - 2*(k1[m] - f0[m]) + hdT[m] for m in range(n)])
+        _count(stats, "rhs_evals", 2)
+        _count(stats, "lu_solves", 3)
+
+        scale = [atol[m] + rtol[m]*max(abs(dep_var[m]), abs(y_new[m])) for m in range(n)]
+        error_norm = _rms([step/6*(k1[m] - 2*k2[m] + k3[m]) for m in range(n)], scale)
+        factor = _max_factor if error_norm == 0 else min(_max_factor, max(_min_factor, _safety*error_norm**(-1/3)))
+        if error_norm <= 1: break
+        h *= factor
+        _count(stats, "rejected")
+        instrument.reject()
+
+    _count(stats, "steps")
+    _rosenbrock_state[func] = {"x" : x_new, "y" : y_new, "f" : f2}
+    return [x_new] + y_new, h*factor
+
+# Ensemble integration, many initial conditions of the same equation advanced together
+# The state is kept column-wise (one list per variable, one entry per trajectory), so every stage of a Runge-Kutta
+# method is a single call of the equation for the whole batch. With vectorized = True eqn(x, y, yd, ...) gets one list
+# per argument and returns a list of values; otherwise it is called once per trajectory as usual
+# Adaptive methods give every trajectory its own x and step size, and on each pass only the trajectories still inside
+# the range are stepped; rejected ones stay where they are with a smaller step
+
+# Explicit Runge-Kutta tableaux (c, a, b, error weights or None); error weights give y_high - y_low per unit step
+_tableaux = {
+    "euler"   : ((0,), ((),), (1,), None),
+    "heun"    : ((0, 1), ((), (1,)), (1/2, 1/2), None),
+    "rk2"     : ((0, 1), ((), (1,)), (1/2, 1/2), None),
+    "rk4"     : ((0, 1/2, 1/2, 1), ((), (1/2,), (0, 1/2), (0, 0, 1)), (1/6, 1/3, 1/3, 1/6), None),
+    "euler2"  : ((0, 1), ((), (1,)), (1/2, 1/2), (1/2, -1/2)),
+    # The last stage is evaluated at the new point, so b is its row of a and the stage is reused (FSAL)
+    "dopri45" : (_dp_c, _dp_a, _dp_a[6] + (0,), _dp_e),
+}
+
+def _ensemble_system(eqn : callable, order : int, vectorized : bool) -> callable :
+    # Column-wise version of make_system
+    def system(xs : list, Y : list[list]) -> list[list] :
+        last = eqn(xs, *Y) if vectorized else [eqn(*args) for args in zip(xs, *Y)]
+        return Y[1:] + [list(last)]
+    return system
+
+def _ensemble_sweep(method : str, system : callable, X : list, Y : list[list], H : list, limit : float, direction : bool, tolerance : float|None, rtol, atol, trajectories : list[_Trajectory]) :
+    # Steps every trajectory until it passes limit, X, Y and H are updated in place
+    c, a, b, e = _tableaux[method]
+    fsal = method == "dopri45"
+    sign = 1 if direction else -1
+    n = len(Y)
+    if method == "euler2" and tolerance is None: tolerance = 0.001
+    if fsal:
+        tolerance = 1e-6 if tolerance is None else tolerance
+        rtol = _tolerance_list(tolerance if rtol is None else rtol, n)
+        atol = _tolerance_list(tolerance if atol is None else atol, n)
+        err_old = [1e-4]*len(X)
+        rejected = [False]*len(X)
+        k1_cache = [None]*len(X)
+
+    active = [i for i in range(len(X)) if ((X[i] < limit) if direction else (X[i] > limit))]
+    while active:
+        xs = [X[i] for i in active]
+        ys = [[col[i] for i in active] for col in Y]
+        steps = [sign*H[i] for i in active]
+
+        K = []
+        for s in range(len(c)):
+            if s == 0 and fsal and all(k1_cache[i] is not None for i in active):
+                K.append([[k1_cache[i][m] for i in active] for m in range(n)])
+                continue
+            stage = []
+            for m in range(n):
+                col = ys[m]
+                for j, coeff in enumerate(a[s]):
+                    if coeff: col = [y + coeff*st*k for y, st, k in zip(col, steps, K[j][m])]
+                stage.append(col)
+            K.append(system([x + c[s]*st for x, st in zip(xs, steps)], stage))
+
+        if fsal:
+            y_new = stage
+        else:
+            y_new = []
+            for m in range(n):
+                col = ys[m]
+                for j, coeff in enumerate(b):
+                    if coeff: col = [y + coeff*st*k for y, st, k in zip(col, steps, K[j][m])]
+                y_new.append(col)
+
+        if e is None:
+            accept = [True]*len(active)
+        else:
+            diffs = [[0.0]*len(active) for _ in range(n)]
+            for m in range(n):
+                for j, coeff in enumerate(e):
+                    if coeff: diffs[m] = [d + coeff*st*k for d, st, k in zip(diffs[m], steps, K[j][m])]
+            accept = []
+            for t, i in enumerate(active):
+                if fsal:
+                    # Same control as dopri45
+                    err = (sum((diffs[m][t]/(atol[m] + rtol[m]*max(abs(ys[m][t]), abs(y_new[m][t]))))**2 for m in range(n))/n)**0.5
+                    if err <= 1:
+                        factor = _max_factor if err == 0 else _safety * err**-_pi_alpha * err_old[i]**_pi_beta
+                        factor = min(_max_factor, max(_min_factor, factor))
+                        if rejected[i]: factor = min(1.0, factor)
+                        err_old[i] = max(err, 1e-4)
+                        rejected[i] = False
+                        k1_cache[i] = [K[6][m][t] for m in range(n)]
+                    else:
+                        factor = max(_min_factor, _safety * err**-0.2)
+                        rejected[i] = True
+                else:
+                    # Same control as euler2
+                    err = max(abs(diffs[m][t]) for m in range(n))
+                    factor = 3 if err == 0 else max(0.1, min(3, 0.9*((tolerance/err)**0.5)))
+                if (err <= 1) if fsal else (err < tolerance):
+                    accept.append(True)
+                else:
+                    accept.append(False)
+                    if fsal and abs(steps[t])*factor + X[i] == X[i]: raise RuntimeError(f"Step size underflow at x = {X[i]}")
+                H[i] *= factor
+
+        for t, i in enumerate(active):
+            if not accept[t]: continue
+            X[i] = xs[t] + steps[t]
+            for m in range(n): Y[m][i] = y_new[m][t]
+            if trajectories is not None: trajectories[i].add([X[i]] + [Y[m][i] for m in range(n)])
+        active = [i for i in active if ((X[i] < limit) if direction else (X[i] > limit))]
+
+def ode_ensemble(order : int, method : str, eqn : callable, indep_var_range : tuple, init_values : list[list], h : float = 0.1, tolerance : float|None = None, vectorized : bool = False, every : int = 1, final_only : bool = False, rtol = None, atol = None) -> list[list[list]] :
+    # Same as calling ode for every initial state in init_values, returns one vars_list per trajectory
+    # Available methods: euler, heun, rk2, rk4, euler2, dopri45
+    method = method.lower()
+    if method not in _tableaux: raise ValueError(f"Ensemble integration is not available for {method}, expected one of {tuple(_tableaux)}")
+    if every < 1: raise ValueError(f"every must be a positive integer, got {every}")
+    system = _ensemble_system(eqn, order, vectorized)
+    count = len(init_values)
+    H = [h]*count
+
+    if final_only:
+        X = [state[0] for state in init_values]
+        Y = [list(col) for col in zip(*(state[1:] for state in init_values))]
+        _ensemble_sweep(method, system, X, Y, H, indep_var_range[1], True, tolerance, rtol, atol, None)
+        return [[[X[i]]] + [[col[i]] for col in Y] for i in range(count)]
+
+    backward = [_Trajectory(order + 1, every, count = 1) for _ in range(count)]
+    X = [state[0] for state in init_values]
+    Y = [list(col) for col in zip(*(state[1:] for state in init_values))]
+    _ensemble_sweep(method, system, X, Y, H, indep_var_range[0], False, tolerance, rtol, atol, backward)
+
+    forward = [_Trajectory(order + 1, every) for _ in range(count)]
+    for trajectory, state in zip(forward, init_values): trajectory.add(list(state))
+    X = [state[0] for state in init_values]
+    Y = [list(col) for col in zip(*(state[1:] for state in init_values))]
+    _ensemble_sweep(method, system, X, Y, H, indep_var_range[1], True, tolerance, rtol, atol, forward)
+
+    return [_join(b, f) for b, f in zip(backward, forward)]
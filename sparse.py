@@ -0,0 +1,166 @@
+# Class for sparse matrices
+
+'''
+Compressed sparse row (CSR) storage, only the non-zero values are kept
+
+[a11,  0 , a13]      data    = [a11, a13, a22, a31, a33]
+[ 0 , a22,  0 ]  ->  indices = [ 0 ,  2 ,  1 ,  0 ,  2 ]     (column of each value)
+[a31,  0 , a33]      indptr  = [0, 2, 3, 5]                  (row i is data[indptr[i]:indptr[i+1]])
+
+Memory and the cost of a matrix-vector product both scale with the number of non-zeros (nnz)
+'''
+
+from array import array
+import operator
+
+from matrix import Matrix
+
+class SparseMatrix:
+    def __init__(self, dimensions : tuple[int, int], indptr, indices, data) :
+        n, m = dimensions
+        if len(indptr) != n+1: raise ValueError(f"Expected {n+1} row pointers, got {len(indptr)}")
+        if len(indices) != len(data) or indptr[-1] != len(data): raise ValueError("Sparse matrix indices and values are inconsistent")
+        self.dimensions = (n, m)
+        self.isSquare = (n == m)
+        self.indptr = array("q", indptr)
+        self.indices = array("q", indices)
+        self.data = list(data)
+
+    @classmethod
+    def from_coo(cls, n : int, m : int, rows : list[int], cols : list[int], vals : list) -> "SparseMatrix" :
+        # Builds from coordinate (COO) triplets, duplicate entries are summed and explicit zeroes dropped
+        if not len(rows) == len(cols) == len(vals): raise ValueError("COO rows, columns and values must have the same length")
+        order = sorted(range(len(vals)), key = lambda k: (rows[k], cols[k]))
+        indptr = [0]*(n+1)
+        indices = []
+        data = []
+        last = None
+        for k in order:
+            i, j = rows[k], cols[k]
+            if not (0 <= i < n and 0 <= j < m): raise IndexError(f"Entry ({i}, {j}) is outside a {n}x{m} matrix")
+            if (i, j) == last: data[-1] += vals[k]
+            else:
+                indices.append(j)
+                data.append(vals[k])
+                indptr[i+1] += 1
+                last = (i, j)
+        for i in range(n): indptr[i+1] += indptr[i]
+        out = cls((n, m), indptr, indices, data)
+        return out.pruned() if any(val == 0 for val in data) else out
+
+    @classmethod
+    def from_dense(cls, matrix : Matrix) -> "SparseMatrix" :
+        indptr = [0]
+        indices = []
+        data = []
+        for row in matrix.vals:
+            for j, val in enumerate(row):
+                if val != 0:
+                    indices.append(j)
+                    data.append(val)
+            indptr.append(len(data))
+        return cls(matrix.dimensions, indptr, indices, data)
+
+    def to_dense(self, storage : str|None = None) -> Matrix :
+        n, m = self.dimensions
+        rows = [[0]*m for _ in range(n)]
+        for i in range(n):
+            row = rows[i]
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                row[self.indices[k]] = self.data[k]
+        return Matrix(rows, storage = storage)
+
+    def to_coo(self) -> tuple[list[int], list[int], list] :
+        rows = [i for i in range(self.dimensions[0]) for _ in range(self.indptr[i], self.indptr[i+1])]
+        return rows, list(self.indices), list(self.data)
+
+    def pruned(self) -> "SparseMatrix" :
+        # Copy without explicitly stored zeroes
+        indptr = [0]
+        indices = []
+        data = []
+        for i in range(self.dimensions[0]):
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                if self.data[k] != 0:
+                    indices.append(self.indices[k])
+                    data.append(self.data[k])
+            indptr.append(len(data))
+        return SparseMatrix(self.dimensions, indptr, indices, data)
+
+    @property
+    def nnz(self) -> int :
+        return len(self.data)
+
+    def row(self, idx : int) -> tuple[array, list] :
+        # Column indices and values of the non-zeroes in a row
+        start, end = self.indptr[idx], self.indptr[idx+1]
+        return self.indices[start:end], self.data[start:end]
+
+    def diagonal(self) -> list :
+        out = [0]*min(self.dimensions)
+        for i in range(len(out)):
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                if self.indices[k] == i: out[i] = self.data[k]
+        return out
+
+    def __getitem__(self, idx):
+        if not isinstance(idx, tuple) or len(idx) != 2: raise ValueError("Sparse matrices are indexed as A[i, j]")
+        i, j = idx
+        n, m = self.dimensions
+        if i < 0: i += n
+        if j < 0: j += m
+        start, end = self.indptr[i], self.indptr[i+1]
+        # Column indices within a row are sorted, so bisect
+        while start < end:
+            mid = (start + end) // 2
+            if self.indices[mid] < j: start = mid + 1
+            else: end = mid
+        if start < self.indptr[i+1] and self.indices[start] == j: return self.data[start]
+        return 0
+
+    def __str__(self):
+        n, m = self.dimensions
+        out = f"{n} x {m} sparse matrix, {self.nnz} non-zeroes"
+        for i, j, val in zip(*self.to_coo()):
+            out += f"\n({i}, {j}) {val}"
+        return out
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return SparseMatrix(self.dimensions, self.indptr, self.indices, [val*other for val in self.data])
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def transpose(self) -> "SparseMatrix" :
+        rows, cols, vals = self.to_coo()
+        return SparseMatrix.from_coo(self.dimensions[1], self.dimensions[0], cols, rows, vals)
+
+    def matvec(self, x) -> list :
+        if len(x) != self.dimensions[1]: raise ValueError(f"Cannot multiply {self.dimensions[0]}x{self.dimensions[1]} sparse matrix with vector of length {len(x)}")
+        mul = operator.mul
+        indptr, indices, data = self.indptr, self.indices, self.data
+        get = x.__getitem__
+        return [sum(map(mul, data[indptr[i]:indptr[i+1]], map(get, indices[indptr[i]:indptr[i+1]]))) for i in range(self.dimensions[0])]
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            if other.dimensions[0] != self.dimensions[1]: raise TypeError(f"Cannot multiply matrices with dimensions {self.dimensions[0]}x{self.dimensions[1]} & {other.dimensions[0]}x{other.dimensions[1]}")
+            columns = [self.matvec(list(col)) for col in zip(*other.vals)]
+            return Matrix([list(row) for row in zip(*columns)], storage = other.storage)
+        if isinstance(other, (list, tuple, array)): return self.matvec(other)
+        raise TypeError(f"Cannot do sparse matrix multiplication with {type(other)}")
+
+def diags(n : int, diagonals : list, offsets : list[int]) -> SparseMatrix :
+    # n x n matrix with the given diagonals, offset 0 is the main diagonal, -1 the one below it, 1 the one above it
+    # Each diagonal is a list of its values, or a single value repeated along it
+    rows, cols, vals = [], [], []
+    for diagonal, offset in zip(diagonals, offsets):
+        length = n - abs(offset)
+        if not isinstance(diagonal, (list, tuple, array)): diagonal = [diagonal]*length
+        if len(diagonal) != length: raise ValueError(f"Diagonal with offset {offset} should have {length} values, got {len(diagonal)}")
+        for k in range(length):
+            rows.append(k - min(offset, 0))
+            cols.append(k + max(offset, 0))
+            vals.append(diagonal[k])
+    return SparseMatrix.from_coo(n, n, rows, cols, vals)